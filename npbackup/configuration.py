@@ -17,6 +17,7 @@ from typing import Tuple, Optional, List, Any, Union
 import sys
 import os
 from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 from ruamel.yaml import YAML
 from ruamel.yaml.compat import ordereddict
@@ -70,6 +71,15 @@ if opt_aes_key:
     AES_KEY = opt_aes_key
 
 
+@lru_cache(maxsize=256)
+def _split_path(path: str, sep: str) -> List[str]:
+    """
+    Config paths are a limited set of literals, so let's split each one only once
+    Returned list is shared between calls and must not be modified
+    """
+    return path.split(sep)
+
+
 # Monkeypatching ruamel.yaml ordreddict so we get to use pseudo dot notations
 # eg data.g('my.array.keys') == data['my']['array']['keys']
 # and data.s('my.array.keys', 'new_value')
@@ -79,7 +89,7 @@ def g(self, path, sep=".", default=None, list_ok=False):
     print(d.g('my.array.keys'))
     """
     try:
-        return self.mlget(path.split(sep), default=default, list_ok=list_ok)
+        return self.mlget(_split_path(path, sep), default=default, list_ok=list_ok)
     except AssertionError as exc:
         logger.debug(
             f"CONFIG ERROR {exc} for path={path},sep={sep},default={default},list_ok={list_ok}"
@@ -389,6 +399,55 @@ def has_random_variables(full_config: dict) -> Tuple[bool, dict]:
     return is_modified, full_config
 
 
+def _evaluate_value(value: Any, repo_config: dict, full_config: dict) -> Any:
+    """
+    Replace runtime variables in a single value, one pass
+    """
+    if isinstance(value, str):
+        if "${MACHINE_ID}" in value:
+            machine_id = full_config.g("identity.machine_id")
+            value = value.replace("${MACHINE_ID}", machine_id if machine_id else "")
+
+        if "${MACHINE_GROUP}" in value:
+            machine_group = full_config.g("identity.machine_group")
+            value = value.replace(
+                "${MACHINE_GROUP}", machine_group if machine_group else ""
+            )
+
+        if "${BACKUP_JOB}" in value:
+            backup_job = repo_config.g("prometheus.backup_job")
+            value = value.replace("${BACKUP_JOB}", backup_job if backup_job else "")
+
+        if "${HOSTNAME}" in value:
+            value = value.replace("${HOSTNAME}", platform.node())
+    if value == "":
+        value = None
+    return value
+
+
+# We need to make a loop to catch all nested variables (ie variable in a variable)
+# but we also need a max recursion limit
+# If each variable has two sub variables, we'd have max 4x2x2 loops
+MAX_VARIABLE_EVALUATIONS = 4 * 2 * 2
+
+
+def evaluate_value(value: Any, full_config: dict, repo_config: dict = None) -> Any:
+    """
+    Replace runtime variables of a single value with their corresponding value
+    Avoids walking the whole config when only a couple of values are needed
+    """
+    if repo_config is None:
+        repo_config = full_config
+    count = 0
+    while count < MAX_VARIABLE_EVALUATIONS:
+        evaluated_value = _evaluate_value(value, repo_config, full_config)
+        if evaluated_value == value:
+            break
+        value = evaluated_value
+        count += 1
+    return value
+
+
 def evaluate_variables(repo_config: dict, full_config: dict) -> dict:
     """
     Replace runtime variables with their corresponding value
@@ -396,35 +455,12 @@ def evaluate_variables(repo_config: dict, full_config: dict) -> dict:
     """
 
     def _evaluate_variables(key, value):
-        if isinstance(value, str):
-            if "${MACHINE_ID}" in value:
-                machine_id = full_config.g("identity.machine_id")
-                value = value.replace("${MACHINE_ID}", machine_id if machine_id else "")
-
-            if "${MACHINE_GROUP}" in value:
-                machine_group = full_config.g("identity.machine_group")
-                value = value.replace(
-                    "${MACHINE_GROUP}", machine_group if machine_group else ""
-                )
-
-            if "${BACKUP_JOB}" in value:
-                backup_job = repo_config.g("prometheus.backup_job")
-                value = value.replace("${BACKUP_JOB}", backup_job if backup_job else "")
+        return _evaluate_value(value, repo_config, full_config)
 
-            if "${HOSTNAME}" in value:
-                value = value.replace("${HOSTNAME}", platform.node())
-        if value == "":
-            value = None
-        return value
-
-    # We need to make a loop to catch all nested variables (ie variable in a variable)
-    # but we also need a max recursion limit
-    # If each variable has two sub variables, we'd have max 4x2x2 loops
     # While this is not the most efficient way, we still get to catch all nested variables
     # and of course, we don't have thousands of lines to parse, so we're good
     count = 0
-    maxcount = 4 * 2 * 2
-    while count < maxcount:
+    while count < MAX_VARIABLE_EVALUATIONS:
         repo_config = replace_in_iterable(
             repo_config, _evaluate_variables, callable_wants_key=True
         )
@@ -815,7 +851,42 @@ def _load_config_file(config_file: Path) -> Union[bool, dict]:
         return False
 
 
+# Already loaded configurations as {config_file: ((st_mtime_ns, st_size), full_config)}
+LOADED_CONFIGS = {}
+
+
+def _get_config_file_signature(config_file: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(config_file)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
 def load_config(config_file: Path) -> Optional[dict]:
+    """
+    Load configuration file, reusing an earlier result when the file didn't change since
+    We always return a copy so callers can modify their configuration without altering the cache
+    """
+    cache_key = str(config_file)
+    signature = _get_config_file_signature(config_file)
+    try:
+        cached_signature, cached_config = LOADED_CONFIGS[cache_key]
+        if signature is not None and signature == cached_signature:
+            logger.debug(f"Using already loaded configuration file {config_file}")
+            return deepcopy(cached_config)
+    except KeyError:
+        pass
+    full_config = _load_config(config_file)
+    if full_config:
+        # Loading may have updated the config file, so we need a fresh signature
+        signature = _get_config_file_signature(config_file)
+        if signature is not None:
+            LOADED_CONFIGS[cache_key] = (signature, deepcopy(full_config))
+    return full_config
+
+
+def _load_config(config_file: Path) -> Optional[dict]:
     full_config = _load_config_file(config_file)
     if not full_config:
         return None
@@ -12,10 +12,13 @@ __build__ = "2024122401"
 
 from typing import Optional, Callable, Union, List
 import os
+import re
 import logging
 import tempfile
+import shlex
 import pidfile
 import queue
+import threading
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from copy import deepcopy
@@ -38,6 +41,77 @@ from npbackup.__debug__ import _DEBUG, exception_to_string
 
 logger = logging.getLogger()
 
+# Permissions allowing each runner operation
+REQUIRED_PERMISSIONS = {
+    "init": frozenset({"backup", "restore", "full"}),
+    "backup": frozenset({"backup", "restore", "full"}),
+    "has_recent_snapshot": frozenset({"backup", "restore", "restore_only", "full"}),
+    "snapshots": frozenset({"backup", "restore", "restore_only", "full"}),
+    "stats": frozenset({"backup", "restore", "full"}),
+    "ls": frozenset({"backup", "restore", "restore_only", "full"}),
+    "find": frozenset({"backup", "restore", "restore_only", "full"}),
+    "restore": frozenset({"restore", "restore_only", "full"}),
+    "dump": frozenset({"restore", "restore_only", "full"}),
+    "check": frozenset({"restore", "full"}),
+    "recover": frozenset({"restore", "full"}),
+    "list": frozenset({"full"}),
+    "unlock": frozenset({"full", "restore", "backup"}),
+    "repair": frozenset({"full"}),
+    "forget": frozenset({"full"}),
+    "housekeeping": frozenset({"full"}),
+    "prune": frozenset({"full"}),
+    "raw": frozenset({"full"}),
+}
+
+# Retention policy entries, and their restic --keep-within unit and multiplier
+# Weeks are converted to days since restic --keep-within doesn't support weeks
+RETENTION_ENTRIES = ("last", "hourly", "daily", "weekly", "monthly", "yearly")
+KEEP_WITHIN_UNITS = {
+    "hourly": ("h", 1),
+    "daily": ("d", 1),
+    "weekly": ("d", 7),
+    "monthly": ("m", 1),
+    "yearly": ("y", 1),
+}
+
+# Characters that require a shell to interpret a command line, including comments (#) and tests ([)
+SHELL_METACHARACTERS = set("|&;<>$`{}*?()~%#[\n")
+
+# Matches a leading variable assignment, eg VAR=value command
+SHELL_VARIABLE_ASSIGNMENT = re.compile(r"\s*[A-Za-z_][A-Za-z0-9_]*=")
+
+# Matches a newline between two non whitespace characters, eg multiline content
+MULTILINE_CONTENT = re.compile(r"\S.*\n\s*\S")
+
+
+class ErrorOnlyFilter(logging.Filter):
+    """
+    Logging filter that drops every record below ERROR level
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.ERROR
+
+
+def split_command(command: str) -> Optional[List[str]]:
+    """
+    Split a simple command line into arguments so it can be run without a shell
+    Returns None if the command needs a shell to be interpreted
+    On Windows, commands are always left to the shell since shlex doesn't handle cmd quoting
+    and builtins like type or echo only exist within cmd
+    """
+    if os.name == "nt":
+        return None
+    if SHELL_METACHARACTERS.intersection(command) or SHELL_VARIABLE_ASSIGNMENT.match(
+        command
+    ):
+        return None
+    try:
+        return shlex.split(command)
+    except ValueError:
+        # Unbalanced quotes, let the shell deal with it
+        return None
+
 
 def metric_writer(
     repo_config: dict,
@@ -186,6 +260,20 @@ def metric_writer(
     return backup_too_small
 
 
+def stack_decorators(*decorators: Callable) -> Callable:
+    """
+    Combine multiple decorators into one
+    Decorators are given in the same order they would be written with @ syntax
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        for deco in reversed(decorators):
+            fn = deco(fn)
+        return fn
+
+    return decorator
+
+
 def get_ntp_offset(ntp_server: str) -> Optional[float]:
     """
     Get current time offset from ntp server
@@ -201,6 +289,44 @@ def get_ntp_offset(ntp_server: str) -> Optional[float]:
     return None
 
 
+def exec_commands(
+    write_logs: Callable,
+    exec_type: str,
+    command_list: List[str],
+    per_command_timeout: int,
+    failure_is_fatal: bool,
+) -> bool:
+    """
+    Execute pre / post backup commands, logging through given write_logs function
+    """
+    commands_success = True
+    if command_list:
+        for command in command_list:
+            exit_code, output = command_runner(
+                command, shell=True, timeout=per_command_timeout
+            )
+            if exit_code != 0:
+                msg = (
+                    f"{exec_type}-execution of command {command} failed with:\n{output}"
+                )
+                commands_success = False
+                if not failure_is_fatal:
+                    write_logs(msg, level="warning")
+                else:
+                    write_logs(msg, level="error")
+                    write_logs(
+                        "Stopping further execution due to fatal error",
+                        level="error",
+                    )
+                    break
+            else:
+                write_logs(
+                    f"{exec_type}-execution of command {command} succeeded with:\n{output}",
+                    level="info",
+                )
+    return commands_success
+
+
 class NPBackupRunner:
     """
     Wraps ResticRunner into a class that is usable by NPBackup
@@ -216,6 +342,7 @@ class NPBackupRunner:
         self._is_ready = False
 
         self._repo_config = None
+        self._repo_name = None
 
         self._dry_run = False
         self._verbose = False
@@ -236,6 +363,9 @@ class NPBackupRunner:
 
         self._produce_metrics = True
 
+        # Cancel event allows stopping group operations from another thread
+        self._canceled_event = threading.Event()
+
     @property
     def repo_config(self) -> dict:
         return self._repo_config
@@ -246,6 +376,8 @@ class NPBackupRunner:
             msg = "Bogus repo config object given"
             self.write_logs(msg, level="critical", raise_error="ValueError")
         self._repo_config = deepcopy(value)
+        # Repo name is used in most log messages, let's not look it up every time
+        self._repo_name = self._repo_config.g("name")
         # Create an instance of restic wrapper
         self.create_restic_runner()
 
@@ -529,26 +661,6 @@ class NPBackupRunner:
 
         @wraps(fn)
         def wrapper(self, *args, **kwargs):
-            required_permissions = {
-                "init": ["backup", "restore", "full"],
-                "backup": ["backup", "restore", "full"],
-                "has_recent_snapshot": ["backup", "restore", "restore_only", "full"],
-                "snapshots": ["backup", "restore", "restore_only", "full"],
-                "stats": ["backup", "restore", "full"],
-                "ls": ["backup", "restore", "restore_only", "full"],
-                "find": ["backup", "restore", "restore_only", "full"],
-                "restore": ["restore", "restore_only", "full"],
-                "dump": ["restore", "retore_only", "full"],
-                "check": ["restore", "full"],
-                "recover": ["restore", "full"],
-                "list": ["full"],
-                "unlock": ["full", "restore", "backup"],
-                "repair": ["full"],
-                "forget": ["full"],
-                "housekeeping": ["full"],
-                "prune": ["full"],
-                "raw": ["full"],
-            }
             try:
                 # When running group_runner, we need to extract operation from kwargs
                 # else, operarion is just the wrapped function name
@@ -563,10 +675,10 @@ class NPBackupRunner:
                     current_permissions = self.repo_config.g("permissions")
                     if (
                         current_permissions
-                        and not current_permissions in required_permissions[operation]
+                        and current_permissions not in REQUIRED_PERMISSIONS[operation]
                     ):
                         self.write_logs(
-                            f"Required permissions for operation '{operation}' must be one of {', '.join(required_permissions[operation])}, current permission is '{current_permissions}'",
+                            f"Required permissions for operation '{operation}' must be one of {', '.join(sorted(REQUIRED_PERMISSIONS[operation]))}, current permission is '{current_permissions}'",
                             level="critical",
                         )
                         raise PermissionError
@@ -732,20 +844,31 @@ class NPBackupRunner:
                 password_command = self.repo_config.g("repo_opts.repo_password_command")
                 if password_command and password_command != "":
                     # NPF-SEC-00003: Avoid password command divulgation
+                    # Use a filter instead of changing log level so we don't alter
+                    # the command_runner logger state for concurrent runners
                     cr_logger = logging.getLogger("command_runner")
-                    cr_loglevel = cr_logger.getEffectiveLevel()
-                    cr_logger.setLevel(logging.ERROR)
-                    exit_code, output = command_runner(
-                        password_command, shell=True, timeout=30
-                    )
-                    cr_logger.setLevel(cr_loglevel)
+                    cr_filter = ErrorOnlyFilter()
+                    cr_logger.addFilter(cr_filter)
+                    try:
+                        # Only spawn a shell when the command actually needs one
+                        command_args = split_command(password_command)
+                        if command_args:
+                            exit_code, output = command_runner(
+                                command_args, shell=False, timeout=30
+                            )
+                        else:
+                            exit_code, output = command_runner(
+                                password_command, shell=True, timeout=30
+                            )
+                    finally:
+                        cr_logger.removeFilter(cr_filter)
                     if exit_code != 0 or output == "":
                         self.write_logs(
                             f"Password command failed to produce output:\n{output}",
                             level="error",
                         )
                         can_run = False
-                    elif "\n" in output.strip():
+                    elif MULTILINE_CONTENT.search(output):
                         self.write_logs(
                             "Password command returned multiline content instead of a string",
                             level="error",
@@ -778,74 +901,59 @@ class NPBackupRunner:
         if not isinstance(self.restic_runner, ResticRunner):
             self.write_logs("Backend not ready", level="error")
             return False
-        try:
-            if self.repo_config.g("repo_opts.upload_speed"):
-                self.restic_runner.limit_upload = self.repo_config.g(
-                    "repo_opts.upload_speed"
-                )
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus upload limit given.", level="error")
-        try:
-            if self.repo_config.g("repo_opts.download_speed"):
-                self.restic_runner.limit_download = self.repo_config.g(
-                    "repo_opts.download_speed"
-                )
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus download limit given.", level="error")
-        try:
-            if self.repo_config.g("repo_opts.backend_connections"):
-                self.restic_runner.backend_connections = self.repo_config.g(
-                    "repo_opts.backend_connections"
-                )
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus backend connections value given.", level="erorr")
-        try:
-            if self.repo_config.g("backup_opts.priority"):
-                self.restic_runner.priority = self.repo_config.g("backup_opts.priority")
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus backup priority in config file.", level="warning")
-        try:
-            if self.repo_config.g("backup_opts.ignore_cloud_files"):
-                self.restic_runner.ignore_cloud_files = self.repo_config.g(
-                    "backup_opts.ignore_cloud_files"
-                )
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus ignore_cloud_files value given", level="warning")
-
-        try:
-            if self.repo_config.g("backup_opts.additional_parameters"):
-                self.restic_runner.additional_parameters = self.repo_config.g(
-                    "backup_opts.additional_parameters"
+        # repo_config.g() returns None for missing keys, so optional settings
+        # don't need exception handling, only bogus values do
+        upload_speed = self.repo_config.g("repo_opts.upload_speed")
+        if upload_speed:
+            try:
+                self.restic_runner.limit_upload = upload_speed
+            except ValueError:
+                self.write_logs("Bogus upload limit given.", level="error")
+        download_speed = self.repo_config.g("repo_opts.download_speed")
+        if download_speed:
+            try:
+                self.restic_runner.limit_download = download_speed
+            except ValueError:
+                self.write_logs("Bogus download limit given.", level="error")
+        backend_connections = self.repo_config.g("repo_opts.backend_connections")
+        if backend_connections:
+            try:
+                self.restic_runner.backend_connections = backend_connections
+            except ValueError:
+                self.write_logs("Bogus backend connections value given.", level="error")
+        priority = self.repo_config.g("backup_opts.priority")
+        if priority:
+            try:
+                self.restic_runner.priority = priority
+            except ValueError:
+                self.write_logs(
+                    "Bogus backup priority in config file.", level="warning"
                 )
-        except KeyError:
-            pass
-        except ValueError:
-            self.write_logs("Bogus additional parameters given", level="warning")
+        ignore_cloud_files = self.repo_config.g("backup_opts.ignore_cloud_files")
+        if ignore_cloud_files:
+            try:
+                self.restic_runner.ignore_cloud_files = ignore_cloud_files
+            except ValueError:
+                self.write_logs("Bogus ignore_cloud_files value given", level="warning")
 
-        try:
-            env_variables = self.repo_config.g("env.env_variables")
-            if not isinstance(env_variables, list):
-                env_variables = [env_variables]
-        except KeyError:
-            env_variables = []
-        try:
-            encrypted_env_variables = self.repo_config.g("env.encrypted_env_variables")
-            if not isinstance(encrypted_env_variables, list):
-                encrypted_env_variables = [encrypted_env_variables]
-        except KeyError:
-            encrypted_env_variables = []
+        additional_parameters = self.repo_config.g("backup_opts.additional_parameters")
+        if additional_parameters:
+            try:
+                self.restic_runner.additional_parameters = additional_parameters
+            except ValueError:
+                self.write_logs("Bogus additional parameters given", level="warning")
+
+        env_variables = self.repo_config.g("env.env_variables", default=[])
+        if not isinstance(env_variables, list):
+            env_variables = [env_variables]
+        encrypted_env_variables = self.repo_config.g(
+            "env.encrypted_env_variables", default=[]
+        )
+        if not isinstance(encrypted_env_variables, list):
+            encrypted_env_variables = [encrypted_env_variables]
 
-        env_variables += encrypted_env_variables
+        # Don't extend the config list in place, since we run this before every operation
+        env_variables = env_variables + encrypted_env_variables
         expanded_env_vars = {}
         if isinstance(env_variables, list):
             for env_variable in env_variables:
@@ -907,34 +1015,33 @@ class NPBackupRunner:
         result: Union[bool, dict],
         output: str = None,
     ):
-        if self.json_output:
-            if isinstance(result, dict):
-                js = result
-                if not "additional_error_info" in js.keys():
-                    js["additional_error_info"] = []
-                if not "additional_warning_info" in js.keys():
-                    js["additional_warning_info"] = []
+        # Fast path, since most calls happen without json output
+        if not self.json_output:
+            return result
+        if isinstance(result, dict):
+            js = result
+            js.setdefault("additional_error_info", [])
+            js.setdefault("additional_warning_info", [])
+        else:
+            js = {
+                "result": result,
+                "operation": fn_name(1),
+                "additional_error_info": [],
+                "additional_warning_info": [],
+            }
+            if result:
+                js["output"] = output
             else:
-                js = {
-                    "result": result,
-                    "operation": fn_name,
-                    "additional_error_info": [],
-                    "additional_warning_info": [],
-                }
-                if result:
-                    js["output"] = output
-                else:
-                    js["reason"] = output
-            if self.errors_for_json:
-                js["additional_error_info"] += self.errors_for_json
-            if self.warnings_for_json:
-                js["additional_warning_info"] += self.warnings_for_json
-            if not js["additional_error_info"]:
-                js.pop("additional_error_info")
-            if not js["additional_warning_info"]:
-                js.pop("additional_warning_info")
-            return js
-        return result
+                js["reason"] = output
+        if self.errors_for_json:
+            js["additional_error_info"] += self.errors_for_json
+        if self.warnings_for_json:
+            js["additional_warning_info"] += self.warnings_for_json
+        if not js["additional_error_info"]:
+            js.pop("additional_error_info")
+        if not js["additional_warning_info"]:
+            js.pop("additional_warning_info")
+        return js
 
     ###########################
     # ACTUAL RUNNER FUNCTIONS #
@@ -948,81 +1055,52 @@ class NPBackupRunner:
     # @exec_timer is next, since we want to calc max exec time (except the close_queues and threaded overhead)
     # All others are in no particular order
     # but @catch_exceptions should come last, since we aren't supposed to have errors in decorators
-
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    # @runner_operation applies the full decorator stack, in the above order
+
+    runner_operation = stack_decorators(
+        threaded,
+        close_queues,
+        catch_exceptions,
+        metrics,
+        exec_timer,
+        check_concurrency,
+        has_permission,
+        is_ready,
+        apply_config_to_restic_runner,
+    )
+
+    @runner_operation
     def init(self) -> bool:
-        self.write_logs(f"Initializing repo {self.repo_config.g('name')}", level="info")
+        self.write_logs(f"Initializing repo {self._repo_name}", level="info")
         return self.restic_runner.init()
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def snapshots(self) -> Optional[dict]:
-        self.write_logs(
-            f"Listing snapshots of repo {self.repo_config.g('name')}", level="info"
-        )
+        self.write_logs(f"Listing snapshots of repo {self._repo_name}", level="info")
         snapshots = self.restic_runner.snapshots()
         return snapshots
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def list(self, subject: str) -> Optional[dict]:
         self.write_logs(
-            f"Listing {subject} objects of repo {self.repo_config.g('name')}",
+            f"Listing {subject} objects of repo {self._repo_name}",
             level="info",
         )
         return self.restic_runner.list(subject)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def find(self, path: str) -> bool:
         self.write_logs(
-            f"Searching for path {path} in repo {self.repo_config.g('name')}",
+            f"Searching for path {path} in repo {self._repo_name}",
             level="info",
         )
         result = self.restic_runner.find(path=path)
         return self.convert_to_json_output(result, None)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def ls(self, snapshot: str) -> Optional[dict]:
         self.write_logs(
-            f"Showing content of snapshot {snapshot} in repo {self.repo_config.g('name')}",
+            f"Showing content of snapshot {snapshot} in repo {self._repo_name}",
             level="info",
         )
         result = self.restic_runner.ls(snapshot)
@@ -1062,19 +1140,20 @@ class NPBackupRunner:
         # has_recent_snapshot returns a tuple when not self.json_output
         result = data[0]
         backup_tz = data[1]
+        repo_name = self._repo_name
         if result:
             self.write_logs(
-                f"Most recent backup in repo {self.repo_config.g('name')} is from {backup_tz}",
+                f"Most recent backup in repo {repo_name} is from {backup_tz}",
                 level="info",
             )
         elif result is False and backup_tz == datetime(1, 1, 1, 0, 0):
             self.write_logs(
-                f"No snapshots found in repo {self.repo_config.g('name')}.",
+                f"No snapshots found in repo {repo_name}.",
                 level="info",
             )
         elif result is False:
             self.write_logs(
-                f"No recent backup found in repo {self.repo_config.g('name')}. Newest is from {backup_tz}",
+                f"No recent backup found in repo {repo_name}. Newest is from {backup_tz}",
                 level="info",
             )
         elif result is None:
@@ -1103,12 +1182,14 @@ class NPBackupRunner:
 
         start_time = datetime.now(timezone.utc)
 
-        stdin_from_command = self.repo_config.g("backup_opts.stdin_from_command")
+        repo_name = self._repo_name
+        backup_opts = self.repo_config.g("backup_opts") or {}
+        stdin_from_command = backup_opts.get("stdin_from_command")
         if not stdin_filename:
-            stdin_filename = self.repo_config.g("backup_opts.stdin_filename")
+            stdin_filename = backup_opts.get("stdin_filename")
             if not stdin_filename:
                 stdin_filename = "stdin.data"
-        source_type = self.repo_config.g("backup_opts.source_type")
+        source_type = backup_opts.get("source_type")
         if source_type in (
             None,
             "folder_list",
@@ -1116,80 +1197,63 @@ class NPBackupRunner:
             "files_from_raw",
         ):
             # Preflight checks
-            paths = self.repo_config.g("backup_opts.paths")
+            paths = backup_opts.get("paths")
             if not paths:
-                msg = (
-                    f"No paths to backup defined for repo {self.repo_config.g('name')}"
-                )
+                msg = f"No paths to backup defined for repo {repo_name}"
                 self.write_logs(msg, level="critical")
                 return self.convert_to_json_output(False, msg)
 
             # Make sure we convert paths to list if only one path is give
-            # Also make sure we remove trailing and ending spaces
+            # Also make sure we remove trailing and ending spaces and duplicates
             try:
                 if not isinstance(paths, list):
                     paths = [paths]
-                paths = [path.strip() for path in paths]
-                for path in paths:
-                    if path == self.repo_config.g("repo_uri"):
-                        msg = f"You cannot backup source into it's own path in repo {self.repo_config.g('name')}. No inception allowed !"
-                        self.write_logs(msg, level="critical")
-                        return self.convert_to_json_output(False, msg)
+                paths = list(dict.fromkeys(path.strip() for path in paths))
+                if self.repo_config.g("repo_uri") in paths:
+                    msg = f"You cannot backup source into it's own path in repo {repo_name}. No inception allowed !"
+                    self.write_logs(msg, level="critical")
+                    return self.convert_to_json_output(False, msg)
             except (AttributeError, KeyError):
-                msg = f"No backup source given for repo {self.repo_config.g('name')}"
+                msg = f"No backup source given for repo {repo_name}"
                 self.write_logs(msg, level="critical")
                 return self.convert_to_json_output(False, msg)
 
             # MSWindows does not support one-file-system option
-            exclude_patterns = self.repo_config.g("backup_opts.exclude_patterns")
+            exclude_patterns = backup_opts.get("exclude_patterns")
             if not isinstance(exclude_patterns, list):
                 exclude_patterns = [exclude_patterns]
 
-            exclude_files = self.repo_config.g("backup_opts.exclude_files")
+            exclude_files = backup_opts.get("exclude_files")
             if not isinstance(exclude_files, list):
                 exclude_files = [exclude_files]
 
-            excludes_case_ignore = self.repo_config.g(
-                "backup_opts.excludes_case_ignore"
-            )
-            exclude_caches = self.repo_config.g("backup_opts.exclude_caches")
+            excludes_case_ignore = backup_opts.get("excludes_case_ignore")
+            exclude_caches = backup_opts.get("exclude_caches")
 
-            exclude_files_larger_than = self.repo_config.g(
-                "backup_opts.exclude_files_larger_than"
-            )
+            exclude_files_larger_than = backup_opts.get("exclude_files_larger_than")
             one_file_system = (
-                self.repo_config.g("backup_opts.one_file_system")
-                if os.name != "nt"
-                else False
+                backup_opts.get("one_file_system") if os.name != "nt" else False
             )
-            use_fs_snapshot = self.repo_config.g("backup_opts.use_fs_snapshot")
+            use_fs_snapshot = backup_opts.get("use_fs_snapshot")
 
-        pre_exec_commands = self.repo_config.g("backup_opts.pre_exec_commands")
-        pre_exec_per_command_timeout = self.repo_config.g(
-            "backup_opts.pre_exec_per_command_timeout"
-        )
-        pre_exec_failure_is_fatal = self.repo_config.g(
-            "backup_opts.pre_exec_failure_is_fatal"
-        )
+        pre_exec_commands = backup_opts.get("pre_exec_commands")
+        pre_exec_per_command_timeout = backup_opts.get("pre_exec_per_command_timeout")
+        pre_exec_failure_is_fatal = backup_opts.get("pre_exec_failure_is_fatal")
 
-        post_exec_commands = self.repo_config.g("backup_opts.post_exec_commands")
-        post_exec_per_command_timeout = self.repo_config.g(
-            "backup_opts.post_exec_per_command_timeout"
-        )
-        post_exec_failure_is_fatal = self.repo_config.g(
-            "backup_opts.post_exec_failure_is_fatal"
-        )
+        post_exec_commands = backup_opts.get("post_exec_commands")
+        post_exec_per_command_timeout = backup_opts.get("post_exec_per_command_timeout")
+        post_exec_failure_is_fatal = backup_opts.get("post_exec_failure_is_fatal")
 
         # Make sure we convert tag to list if only one tag is given
         try:
-            tags = self.repo_config.g("backup_opts.tags")
+            tags = backup_opts.get("tags")
             if not isinstance(tags, list):
                 tags = [tags]
         except KeyError:
             tags = None
 
-        additional_backup_only_parameters = self.repo_config.g(
-            "backup_opts.additional_backup_only_parameters"
+        additional_backup_only_parameters = backup_opts.get(
+            "additional_backup_only_parameters"
         )
 
         if not force:
@@ -1220,59 +1284,29 @@ class NPBackupRunner:
         ):
             if source_type not in ["folder_list", None]:
                 self.write_logs(
-                    f"Running backup of files in {paths} list to repo {self.repo_config.g('name')}",
+                    f"Running backup of files in {paths} list to repo {repo_name}",
                     level="info",
                 )
             else:
                 self.write_logs(
-                    f"Running backup of {paths} to repo {self.repo_config.g('name')}",
+                    f"Running backup of {paths} to repo {repo_name}",
                     level="info",
                 )
         elif source_type == "stdin_from_command" and stdin_from_command:
             self.write_logs(
-                f"Running backup of given command stdout as name {stdin_filename} to repo {self.repo_config.g('name')}",
+                f"Running backup of given command stdout as name {stdin_filename} to repo {repo_name}",
                 level="info",
             )
         elif read_from_stdin:
             self.write_logs(
-                f"Running backup of piped stdin data as name {stdin_filename} to repo {self.repo_config.g('name')}",
+                f"Running backup of piped stdin data as name {stdin_filename} to repo {repo_name}",
                 level="info",
             )
         else:
             raise ValueError("Unknown source type given")
 
-        def _exec_commands(
-            exec_type: str,
-            command_list: List[str],
-            per_command_timeout: int,
-            failure_is_fatal: bool,
-        ):
-            commands_success = True
-            if command_list:
-                for command in command_list:
-                    exit_code, output = command_runner(
-                        command, shell=True, timeout=per_command_timeout
-                    )
-                    if exit_code != 0:
-                        msg = f"{exec_type}-execution of command {command} failed with:\n{output}"
-                        commands_success = False
-                        if not failure_is_fatal:
-                            self.write_logs(msg, level="warning")
-                        else:
-                            self.write_logs(msg, level="error")
-                            self.write_logs(
-                                "Stopping further execution due to fatal error",
-                                level="error",
-                            )
-                            break
-                    else:
-                        self.write_logs(
-                            f"{exec_type}-execution of command {command} succeeded with:\n{output}",
-                            level="info",
-                        )
-            return commands_success
-
-        pre_exec_commands_success = _exec_commands(
+        pre_exec_commands_success = exec_commands(
+            self.write_logs,
             "Pre",
             pre_exec_commands,
             pre_exec_per_command_timeout,
@@ -1326,7 +1360,8 @@ class NPBackupRunner:
                 level="debug",
             )
 
-            post_exec_commands_success = _exec_commands(
+            post_exec_commands_success = exec_commands(
+                self.write_logs,
                 "Post",
                 post_exec_commands,
                 post_exec_per_command_timeout,
@@ -1356,11 +1391,16 @@ class NPBackupRunner:
                 "Backup is smaller than configured minmium backup size", level="error"
             )
 
-        operation_result = (
-            result
-            and pre_exec_commands_success
-            and post_exec_commands_success
-            and not backup_too_small
+        # In json mode, backend result is a dict which is always truthy
+        result_is_dict = isinstance(result, dict)
+        result_ok = result["result"] if result_is_dict else bool(result)
+        operation_result = all(
+            (
+                result_ok,
+                pre_exec_commands_success,
+                post_exec_commands_success,
+                not backup_too_small,
+            )
         )
         msg = f"Operation finished with {'success' if operation_result else 'failure'}"
         self.write_logs(
@@ -1371,21 +1411,13 @@ class NPBackupRunner:
 
         if not operation_result:
             # patch result if json
-            if isinstance(result, dict):
+            if result_is_dict:
                 result["result"] = False
             # Don't overwrite backend output in case of failure
             return self.convert_to_json_output(result)
         return self.convert_to_json_output(result, msg)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def restore(self, snapshot: str, target: str, restore_includes: List[str]) -> bool:
         self.write_logs(f"Launching restore to {target}", level="info")
         return self.restic_runner.restore(
@@ -1394,15 +1426,7 @@ class NPBackupRunner:
             includes=restore_includes,
         )
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def forget(
         self, snapshots: Optional[Union[List[str], str]] = None, use_policy: bool = None
     ) -> bool:
@@ -1414,7 +1438,8 @@ class NPBackupRunner:
             # Let's check if we can get a valid NTP server offset
             # If offset is too big, we won't apply policy
             # Offset should not be higher than 10 minutes, eg 600 seconds
-            ntp_server = self.repo_config.g("repo_opts.retention_policy.ntp_server")
+            retention = self.repo_config.g("repo_opts.retention_policy") or {}
+            ntp_server = retention.get("ntp_server")
             if ntp_server:
                 offset = get_ntp_offset(ntp_server)
                 if not offset or offset >= 600:
@@ -1424,23 +1449,16 @@ class NPBackupRunner:
 
             # Build policiy from config
             policy = {}
-            for entry in ["last", "hourly", "daily", "weekly", "monthly", "yearly"]:
-                value = self.repo_config.g(f"repo_opts.retention_policy.{entry}")
+            keep_within = retention.get("keep_within")
+            for entry in RETENTION_ENTRIES:
+                value = retention.get(entry)
                 if value:
-                    if (
-                        not self.repo_config.g("repo_opts.retention_policy.keep_within")
-                        or entry == "last"
-                    ):
+                    if not keep_within or entry == "last":
                         policy[f"keep-{entry}"] = value
                     else:
-                        # We need to add a type value for keep-within
-                        unit = entry[0:1]
-                        # Patch weeks to days since restic --keep-within doesn't support weeks
-                        if unit == "w":
-                            unit = "d"
-                            value = value * 7
-                        policy[f"keep-within-{entry}"] = f"{value}{unit}"
-            keep_tags = self.repo_config.g("repo_opts.retention_policy.tags")
+                        unit, multiplier = KEEP_WITHIN_UNITS[entry]
+                        policy[f"keep-within-{entry}"] = f"{value * multiplier}{unit}"
+            keep_tags = retention.get("tags")
             if not isinstance(keep_tags, list) and keep_tags:
                 keep_tags = [keep_tags]
                 policy["keep-tags"] = keep_tags
@@ -1453,7 +1471,7 @@ class NPBackupRunner:
             # Convert group by to list
             group_by = []
             for entry in ["host", "paths", "tags"]:
-                if self.repo_config.g(f"repo_opts.retention_policy.group_by_{entry}"):
+                if retention.get(f"group_by_{entry}"):
                     group_by.append(entry)
 
             self.write_logs(
@@ -1469,15 +1487,7 @@ class NPBackupRunner:
             result = False
         return self.convert_to_json_output(result)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def housekeeping(self) -> bool:
         """
         Runs unlock, check, forget and prune in one go
@@ -1491,45 +1501,47 @@ class NPBackupRunner:
         # We need to construct our own result here since this is a wrapper for 3 different subcommandzsz
         js = {
             "result": True,
-            "operation": fn_name(0),
+            "operation": "housekeeping",
             "args": None,
         }
 
+        def _succeeded(result: Union[bool, dict]) -> bool:
+            """
+            Operations return a dict in json mode, a bool otherwise
+            """
+            if isinstance(result, dict):
+                return result["result"]
+            return bool(result)
+
         check_result = None
         forget_result = None
         prune_result = None
 
         unlock_result = self.unlock(**kwargs)
-        if (isinstance(unlock_result, bool) and unlock_result) or (
-            isinstance(unlock_result, dict) and unlock_result["result"]
-        ):
+        if _succeeded(unlock_result):
             check_result = self.check(**kwargs, read_data=False)
-            if (isinstance(check_result, bool) and check_result) or (
-                isinstance(check_result, dict) and check_result["result"]
-            ):
+            if _succeeded(check_result):
                 # pylint: disable=E1123 (unexpected-keyword-arg)
                 forget_result = self.forget(use_policy=True, **kwargs)
-                if (isinstance(forget_result, bool) and forget_result) or (
-                    isinstance(forget_result, dict) and forget_result["result"]
-                ):
+                if _succeeded(forget_result):
                     # pylint: disable=E1123 (unexpected-keyword-arg)
                     prune_result = self.prune(**kwargs)
                     result = prune_result
                 else:
                     self.write_logs(
-                        f"Forget failed. Won't continue housekeeping on repo {self.repo_config.g('name')}",
+                        f"Forget failed. Won't continue housekeeping on repo {self._repo_name}",
                         level="error",
                     )
                     result = forget_result
             else:
                 self.write_logs(
-                    f"Check failed. Won't continue housekeeping on repo {self.repo_config.g('name')}",
+                    f"Check failed. Won't continue housekeeping on repo {self._repo_name}",
                     level="error",
                 )
                 result = check_result
         else:
             self.write_logs(
-                f"Unlock failed. Won't continue housekeeping in repo {self.repo_config.g('name')}",
+                f"Unlock failed. Won't continue housekeeping in repo {self._repo_name}",
                 level="error",
             )
             result = unlock_result
@@ -1544,41 +1556,23 @@ class NPBackupRunner:
             }
         return self.convert_to_json_output(js)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def check(self, read_data: bool = True) -> bool:
         if read_data:
             self.write_logs(
-                f"Running full data check of repository {self.repo_config.g('name')}",
+                f"Running full data check of repository {self._repo_name}",
                 level="info",
             )
         else:
             self.write_logs(
-                f"Running metadata consistency check of repository {self.repo_config.g('name')}",
+                f"Running metadata consistency check of repository {self._repo_name}",
                 level="info",
             )
         return self.restic_runner.check(read_data)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def prune(self, prune_max: bool = False) -> bool:
-        self.write_logs(
-            f"Pruning snapshots for repo {self.repo_config.g('name')}", level="info"
-        )
+        self.write_logs(f"Pruning snapshots for repo {self._repo_name}", level="info")
         if prune_max:
             max_unused = self.repo_config.g("prune_max_unused")
             max_repack_size = self.repo_config.g("prune_max_repack_size")
@@ -1589,92 +1583,42 @@ class NPBackupRunner:
             result = self.restic_runner.prune()
         return result
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def repair(self, subject: str, pack_ids: str = None) -> bool:
-        self.write_logs(
-            f"Repairing {subject} in repo {self.repo_config.g('name')}", level="info"
-        )
+        self.write_logs(f"Repairing {subject} in repo {self._repo_name}", level="info")
         return self.restic_runner.repair(subject, pack_ids)
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def recover(self) -> bool:
-        self.write_logs(
-            f"Recovering snapshots in repo {self.repo_config.g('name')}", level="info"
-        )
+        self.write_logs(f"Recovering snapshots in repo {self._repo_name}", level="info")
         return self.restic_runner.recover()
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def unlock(self) -> bool:
-        self.write_logs(f"Unlocking repo {self.repo_config.g('name')}", level="info")
+        self.write_logs(f"Unlocking repo {self._repo_name}", level="info")
         return self.restic_runner.unlock()
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def dump(self, snapshot: str, path: str) -> bool:
         self.write_logs(
-            f"Dumping {path} from {self.repo_config.g('name')} snapshot {snapshot}",
+            f"Dumping {path} from {self._repo_name} snapshot {snapshot}",
             level="info",
         )
         result = self.restic_runner.dump(snapshot, path)
         return result
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def stats(self, subject: str = None) -> bool:
-        self.write_logs(
-            f"Getting stats of repo {self.repo_config.g('name')}", level="info"
-        )
+        self.write_logs(f"Getting stats of repo {self._repo_name}", level="info")
         result = self.restic_runner.stats(subject)
         return result
 
-    @threaded
-    @close_queues
-    @catch_exceptions
-    @metrics
-    @exec_timer
-    @check_concurrency
-    @has_permission
-    @is_ready
-    @apply_config_to_restic_runner
+    @runner_operation
     def raw(self, command: str) -> bool:
+        if not command or not command.strip():
+            msg = "No raw command given"
+            self.write_logs(msg, level="critical")
+            return self.convert_to_json_output(False, msg)
         self.write_logs(f"Running raw command: {command}", level="info")
         return self.restic_runner.raw(command=command)
 
@@ -1687,22 +1631,27 @@ class NPBackupRunner:
 
         # Make sure we don't close the stdout/stderr queues when running multiple operations
         # Also make sure we don't thread functions
-        kwargs = {
-            **kwargs,
-            **{
-                "__close_queues": False,
-                "__no_threads": True,
-            },
-        }
+        kwargs = {**kwargs, "__close_queues": False, "__no_threads": True}
 
         js = {"result": None, "group": True, "output": []}
 
+        # Resolve the operation only once, since it's the same for all repos
+        operation_fn = getattr(self, operation)
+        is_canceled = self._canceled_event.is_set
+
         for repo_config in repo_config_list:
+            if is_canceled():
+                self.write_logs(
+                    f"Group operation {operation} canceled, skipping remaining repos",
+                    level="warning",
+                )
+                group_result = False
+                break
             repo_name = repo_config.g("name")
             self.write_logs(f"Running {operation} for repo {repo_name}", level="info")
             self.repo_config = repo_config
             try:
-                result = self.__getattribute__(operation)(**kwargs)
+                result = operation_fn(**kwargs)
             except Exception as exc:
                 logger.error(
                     f"Operation {operation} for repo {repo_name} failed with: {exc}"
@@ -1733,5 +1682,7 @@ class NPBackupRunner:
     def cancel(self):
         """
         This is just a shorthand to make sure restic_wrapper receives a cancel signal
+        Also stops group operations before they run on the next repo
         """
+        self._canceled_event.set()
         self.restic_runner.cancel()
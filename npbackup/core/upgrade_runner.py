@@ -11,9 +11,12 @@ __build__ = "2024041801"
 
 
 import os
-from typing import Optional
+import struct
+import time
+from enum import IntEnum
+from typing import Optional, Tuple, List
 import tempfile
-from logging import getLogger
+from logging import getLogger, WARNING
 from npbackup.upgrade_client.upgrader import auto_upgrader, _check_new_version
 import npbackup.configuration
 from npbackup.path_helper import CURRENT_DIR
@@ -22,6 +25,27 @@ from npbackup.path_helper import CURRENT_DIR
 logger = getLogger()
 
 
+# Once we found a writable upgrade counter file, we'll stick to it
+COUNTER_FILE_PATH = None
+# Upgrade counter is stored as a 4 bytes little endian unsigned int
+COUNTER_FORMAT = "<I"
+COUNTER_SIZE = struct.calcsize(COUNTER_FORMAT)
+
+
+def _decode_counter(content: bytes) -> int:
+    """
+    Decode upgrade counter file content, which may still be plain text when written by older versions
+    Plain text counters are checked first since a 4 digit text counter is also COUNTER_SIZE long
+    """
+    if not content:
+        return 1
+    if content.strip().isdigit():
+        return int(content)
+    if len(content) == COUNTER_SIZE:
+        return struct.unpack(COUNTER_FORMAT, content)[0]
+    raise ValueError(f"Unknown counter content {content!r}")
+
+
 def need_upgrade(upgrade_interval: int) -> bool:
     """
     Basic counter which allows an upgrade only every X times this is called so failed operations won't end in an endless upgrade loop
@@ -32,28 +56,37 @@ def need_upgrade(upgrade_interval: int) -> bool:
 
     The for loop logic isn't straight simple, but allows file fallback
     """
+    global COUNTER_FILE_PATH
+
     # file counter, local, home, or temp if not available
     counter_file = "npbackup.autoupgrade.log"
 
-    def _write_count(file: str, count: int) -> bool:
-        try:
-            with open(file, "w", encoding="utf-8") as fpw:
-                fpw.write(str(count))
-                return True
-        except OSError:
-            # We may not have write privileges, hence we need a backup plan
-            return False
-
-    def _get_count(file: str) -> Optional[int]:
+    def _update_count(file: str, upgrade_interval: int) -> Optional[int]:
+        """
+        Read and increment the counter in one go, resetting it once upgrade_interval is reached
+        Returns the count before update, or None if the file cannot be read or written
+        """
         try:
-            with open(file, "r", encoding="utf-8") as fpr:
-                count = int(fpr.read())
+            # a+ mode creates the file if needed without truncating it
+            with open(file, "a+b") as fp:
+                fp.seek(0)
+                content = fp.read()
+                try:
+                    count = _decode_counter(content)
+                except ValueError as exc:
+                    logger.error(f"Bogus upgrade counter in {file}: {exc}")
+                    count = 1
+                fp.seek(0)
+                fp.truncate()
+                fp.write(
+                    struct.pack(
+                        COUNTER_FORMAT, 1 if count >= upgrade_interval else count + 1
+                    )
+                )
                 return count
         except OSError as exc:
-            # We may not have read privileges
-            logger.eror(f"Cannot read upgrade counter file {file}: {exc}")
-        except ValueError as exc:
-            logger.error(f"Bogus upgrade counter in {file}: {exc}")
+            # We may not have write privileges, hence we need a backup plan
+            logger.debug(f"Cannot use upgrade counter file {file}: {exc}")
         return None
 
     try:
@@ -61,6 +94,10 @@ def need_upgrade(upgrade_interval: int) -> bool:
     except ValueError:
         logger.error("Bogus upgrade interval given. Will not upgrade")
         return False
+    # No need to touch the counter file when every run is an upgrade run
+    if upgrade_interval <= 1:
+        logger.info("Auto upgrade has decided upgrade check is required")
+        return True
 
     path_list = [
         os.path.join(tempfile.gettempdir(), counter_file),
@@ -68,60 +105,134 @@ def need_upgrade(upgrade_interval: int) -> bool:
     ]
     if os.name != "nt":
         path_list = [os.path.join("/var/log", counter_file)] + path_list
+    if COUNTER_FILE_PATH:
+        path_list = [COUNTER_FILE_PATH] + path_list
 
     for file in path_list:
-        if not os.path.isfile(file):
-            if _write_count(file, 1):
-                logger.debug("Initial upgrade counter written to %s", file)
-            else:
-                logger.debug("Cannot write to upgrade counter file %s", file)
-                continue
-        count = _get_count(file)
-        # Make sure we can write to the file before we make any assumptions
-        result = _write_count(file, count + 1)
-        if result:
-            if count >= upgrade_interval:
-                # Reinitialize upgrade counter before we actually approve upgrades
-                if _write_count(file, 1):
-                    logger.info("Auto upgrade has decided upgrade check is required")
-                    return True
-            break
-        else:
-            logger.debug("Cannot write upgrade counter to %s", file)
+        count = _update_count(file, upgrade_interval)
+        if count is None:
             continue
+        COUNTER_FILE_PATH = file
+        if count >= upgrade_interval:
+            logger.info("Auto upgrade has decided upgrade check is required")
+            return True
+        break
     return False
 
 
-def check_new_version(full_config: dict) -> bool:
-    upgrade_url = full_config.g("global_options.auto_upgrade_server_url")
-    username = full_config.g("global_options.auto_upgrade_server_username")
-    password = full_config.g("global_options.auto_upgrade_server_password")
-    if not upgrade_url or not username or not password:
+class UpgradeCheck(IntEnum):
+    """
+    Result of an upgrade server version check
+    UNKNOWN means auto upgrade is misconfigured or the upgrade server could not be reached
+    """
+
+    UNKNOWN = 0
+    NO_UPDATE = 1
+    UPDATE = 2
+
+
+# Cache of upgrade server version checks as {(upgrade_url, username): (monotonic time, result)}
+VERSION_CHECK_CACHE = {}
+VERSION_CHECK_TTL = 300
+
+# global_options keys required to reach the upgrade server
+UPGRADE_CREDENTIAL_KEYS = (
+    "auto_upgrade_server_url",
+    "auto_upgrade_server_username",
+    "auto_upgrade_server_password",
+)
+# Optional global_options keys identifying this host to the upgrade server
+UPGRADE_IDENTITY_KEYS = (
+    "auto_upgrade_host_identity",
+    "auto_upgrade_group",
+)
+UPGRADE_SETTINGS_KEYS = UPGRADE_CREDENTIAL_KEYS + UPGRADE_IDENTITY_KEYS
+
+
+def _get_upgrade_settings(
+    full_config: dict,
+) -> Tuple[Tuple[str, str, str, str, str], List[str]]:
+    """
+    Returns upgrade server url, username, password, host identity and group
+    with a single config lookup, and the list of missing required keys among them
+    """
+    # global_options is a top level key, no need for a dotted path lookup
+    get_option = (full_config.get("global_options") or {}).get
+    settings = tuple(get_option(key) for key in UPGRADE_SETTINGS_KEYS)
+    missing = [
+        key for key, value in zip(UPGRADE_CREDENTIAL_KEYS, settings) if not value
+    ]
+    return settings, missing
+
+
+def _warn_missing_settings(missing: List[str], context: str) -> None:
+    """
+    Log missing auto upgrade settings, only building the message when it will be emitted
+    """
+    if logger.isEnabledFor(WARNING):
         logger.warning(
-            "Missing auto upgrade info, cannot check new version for auto upgrade"
+            "Missing auto upgrade info: %s, cannot %s", ", ".join(missing), context
         )
-        return None
-    else:
-        return _check_new_version(upgrade_url, username, password)
+
+
+def check_new_version(full_config: dict, force: bool = False) -> UpgradeCheck:
+    """
+    Check upgrade server for a new version
+    Results are cached for VERSION_CHECK_TTL seconds per upgrade server / user, unless force is given
+    """
+    settings, missing = _get_upgrade_settings(full_config)
+    creds = settings[0:3]
+    if missing:
+        _warn_missing_settings(missing, "check new version for auto upgrade")
+        return UpgradeCheck.UNKNOWN
+    cache_key = creds[0:2]
+    if not force:
+        try:
+            check_time, result = VERSION_CHECK_CACHE[cache_key]
+            if time.monotonic() - check_time < VERSION_CHECK_TTL:
+                logger.debug("Using cached upgrade server version check result")
+                return result
+        except KeyError:
+            pass
+    result = _check_new_version(*creds)
+    if result is None:
+        # Don't cache failures, so we retry on next call
+        return UpgradeCheck.UNKNOWN
+    result = UpgradeCheck.UPDATE if result else UpgradeCheck.NO_UPDATE
+    VERSION_CHECK_CACHE[cache_key] = (time.monotonic(), result)
+    return result
 
 
 def run_upgrade(
-    config_file: str, full_config: dict, ignore_errors: bool = False
+    config_file: str,
+    full_config: dict,
+    ignore_errors: bool = False,
+    known_new_version: Optional[UpgradeCheck] = None,
 ) -> bool:
-    upgrade_url = full_config.g("global_options.auto_upgrade_server_url")
-    username = full_config.g("global_options.auto_upgrade_server_username")
-    password = full_config.g("global_options.auto_upgrade_server_password")
-    if not upgrade_url or not username or not password:
-        logger.warning("Missing auto upgrade info, cannot launch auto upgrade")
+    """
+    Launch auto upgrade
+    known_new_version can be given with a check_new_version result, so we don't query the upgrade server again
+    """
+    (
+        upgrade_url,
+        username,
+        password,
+        auto_upgrade_host_identity,
+        group,
+    ), missing = _get_upgrade_settings(full_config)
+    if missing:
+        _warn_missing_settings(missing, "launch auto upgrade")
         return False
 
-    evaluated_full_config = npbackup.configuration.evaluate_variables(
-        full_config, full_config
-    )
-    auto_upgrade_host_identity = evaluated_full_config.g(
-        "global_options.auto_upgrade_host_identity"
-    )
-    group = evaluated_full_config.g("global_options.auto_upgrade_group")
+    if known_new_version == UpgradeCheck.NO_UPDATE:
+        logger.info("Current version is up-to-date, no upgrade needed")
+        os.environ["NPBACKUP_UPGRADE_STATE"] = "0"
+        return False
+
+    # Only evaluate the variables we need instead of the whole config
+    evaluate_value = npbackup.configuration.evaluate_value
+    auto_upgrade_host_identity = evaluate_value(auto_upgrade_host_identity, full_config)
+    group = evaluate_value(group, full_config)
 
     result = auto_upgrader(
         config_file=config_file,
@@ -131,5 +242,6 @@ def run_upgrade(
         auto_upgrade_host_identity=auto_upgrade_host_identity,
         group=group,
         ignore_errors=ignore_errors,
+        skip_version_check=known_new_version == UpgradeCheck.UPDATE,
     )
     return result
@@ -12,15 +12,15 @@ __license__ = "GPL-3.0-only"
 from typing import List, Optional, Tuple
 import sys
 import os
-import re
-import gc
+import time
 from argparse import ArgumentParser
+from concurrent import futures
 from pathlib import Path
+from types import SimpleNamespace
+from collections import OrderedDict
 from logging import getLogger
 import ofunctions.logger_utils
 from datetime import datetime, timezone
-import dateutil
-from time import sleep
 from ruamel.yaml.comments import CommentedMap
 import atexit
 from ofunctions.process import kill_childs
@@ -48,11 +48,11 @@ from resources.customization import (
     OEM_ICON,
     SHORT_PRODUCT_NAME,
 )
-from npbackup.gui.config import config_gui
-from npbackup.gui.operations import operations_gui
+# config_gui and operations_gui are imported when needed, since viewer mode never uses them
 from npbackup.gui.helpers import get_anon_repo_uri, gui_thread_runner
 from npbackup.core.i18n_helper import _t
 from npbackup.core import upgrade_runner
+from npbackup.core.upgrade_runner import UpgradeCheck
 from npbackup.path_helper import CURRENT_DIR
 from npbackup.__version__ import version_dict, version_string
 from npbackup.__debug__ import _DEBUG, _NPBACKUP_ALLOW_AUTOUPGRADE_DEBUG
@@ -67,29 +67,38 @@ backend_binary = None
 # Also prevents showing errors when config was just changed
 GUI_STATUS_IGNORE_ERRORS = True
 
+# Keep the data trees of the last shown snapshots as {(repo_uri, snapshot_id): (backup_id, treedata)}
+LS_WINDOW_CACHE = OrderedDict()
+LS_WINDOW_CACHE_SIZE = 4
 
-sg.theme(SIMPLEGUI_THEME)
-sg.SetOptions(icon=OEM_ICON)
+# Seconds during which a snapshot list is reused instead of querying the repo again
+GUI_DATA_CACHE_TTL = 5
 
+# Buttons which are only usable once a config is loaded
+ACTION_BUTTONS = (
+    "--LAUNCH-BACKUP--",
+    "--SEE-CONTENT--",
+    "--OPERATIONS--",
+    "--FORGET--",
+    "--CONFIGURE--",
+)
 
-def popup_wait_for_upgrade(text: str):
+# Marker for placeholder nodes which make not yet loaded directories expandable in ls window
+LAZY_TREE_PLACEHOLDER = "__lazy_tree_placeholder__"
 
-    layout = [[sg.Text(text)]]
-    window = sg.Window(
-        "Upgrade", layout=layout, no_titlebar=False, keep_on_top=True, finalize=True
-    )
-    window.read(timeout=0)
-    return window
+
+sg.theme(SIMPLEGUI_THEME)
+sg.SetOptions(icon=OEM_ICON)
 
 
 def about_gui(
     version_string: str,
     config_file: str,
     full_config: dict = None,
-    auto_upgrade_result: bool = False,
+    auto_upgrade_result: UpgradeCheck = UpgradeCheck.UNKNOWN,
 ) -> None:
 
-    if auto_upgrade_result:
+    if auto_upgrade_result == UpgradeCheck.UPDATE:
         new_version = [
             sg.Button(
                 _t("config_gui.auto_upgrade_launch"),
@@ -97,10 +106,10 @@ def about_gui(
                 size=(12, 2),
             )
         ]
-    elif auto_upgrade_result is False:
+    elif auto_upgrade_result == UpgradeCheck.NO_UPDATE:
         new_version = [sg.Text(_t("generic.is_uptodate"))]
     else:
-        # auto_upgrade_result is None
+        # auto_upgrade_result is UpgradeCheck.UNKNOWN
         new_version = [sg.Text(_t("config_gui.auto_upgrade_disabled"))]
     layout = [
         [sg.Text(version_string)],
@@ -128,7 +137,9 @@ def about_gui(
             )
             if result == "OK":
                 logger.info("Running GUI initiated upgrade")
-                sub_result = upgrade_runner.run_upgrade(config_file, full_config)
+                sub_result = upgrade_runner.run_upgrade(
+                    config_file, full_config, known_new_version=auto_upgrade_result
+                )
                 if sub_result:
                     sys.exit(0)
                 else:
@@ -187,6 +198,73 @@ def viewer_repo_gui(
     return values["-REPO-URI-"], values["-REPO-PASSWORD-"]
 
 
+class TreeNode:
+    """
+    Drop-in replacement for sg.TreeData.Node using __slots__, since ls trees can hold hundreds of thousands of nodes
+    photo is set by sg.Tree when the node gets inserted into the widget
+    """
+
+    __slots__ = ("parent", "children", "key", "text", "values", "icon", "photo")
+
+    def __init__(self, parent, key, text, values, icon=None):
+        self.parent = parent
+        self.children = []
+        self.key = key
+        self.text = text
+        self.values = values
+        self.icon = icon
+
+
+def _add_missing_tree_parents(tree_dict: dict, parent_path: str, is_nt: bool) -> None:
+    """
+    restic lists directories before their content, but filtered listings may miss some of them
+    Create missing parent directory nodes iteratively, so we don't hit recursion limits on deep trees
+    """
+    missing = []
+    path = parent_path
+    key = path.lower() if is_nt else path
+    # Root key "" always exists, so this ends
+    while key not in tree_dict:
+        missing.append((key, path))
+        path = path.rpartition("/")[0]
+        key = path.lower() if is_nt else path
+    for key, path in reversed(missing):
+        parent_path, _, name = path.rpartition("/")
+        parent = parent_path.lower() if is_nt else parent_path
+        node = TreeNode(parent, key, name, ["", ""], FOLDER_ICON)
+        tree_dict[key] = node
+        tree_dict[parent].children.append(node)
+
+
+def _shallow_tree_node(node: TreeNode) -> TreeNode:
+    """
+    Copy a tree node without its children, so it can be shown before its children are loaded
+    Directories with content get a placeholder child so they still show up as expandable
+    """
+    shallow_node = TreeNode(node.parent, node.key, node.text, node.values, node.icon)
+    if node.children:
+        shallow_node.children.append(
+            TreeNode(node.key, (LAZY_TREE_PLACEHOLDER, node.key), "...", ["", ""])
+        )
+    return shallow_node
+
+
+def _load_tree_node_children(tree: sg.Tree, treedata: sg.TreeData) -> None:
+    """
+    Replace the placeholder of the tree node being expanded with its actual children
+    """
+    item_id = tree.Widget.focus()
+    key = tree.IdToKey.get(item_id)
+    placeholder_id = tree.KeyToID.pop((LAZY_TREE_PLACEHOLDER, key), None)
+    if placeholder_id is None:
+        # Children are already loaded
+        return
+    del tree.IdToKey[placeholder_id]
+    tree.Widget.delete(placeholder_id)
+    for child in treedata.tree_dict[key].children:
+        tree.add_treeview_data(_shallow_tree_node(child))
+
+
 @threaded
 def _make_treedata_from_json(ls_result: List[dict]) -> sg.TreeData:
     """
@@ -202,129 +280,86 @@ def _make_treedata_from_json(ls_result: List[dict]) -> sg.TreeData:
     ]
 
     Since v3-rc6, we're actually using a msgspec.Struct represenation which uses dot notation, but only on Python 3.8+
-    We still rely on json for Python 3.7
+    We still rely on json for Python 3.7, in which case entries are converted to namespaces first
     """
     treedata = sg.TreeData()
-    count = 0
     if isinstance(ls_result[0], dict):
-        HAVE_MSGSPEC = False
-    else:
-        HAVE_MSGSPEC = True
-    if not HAVE_MSGSPEC:
         logger.info(
             "Using basic json representation for data which is slow and memory hungry. Consider using a newer OS that supports Python 3.8+"
         )
+        # Convert entries once so we only have a single dot notation code path below
+        ls_result = [SimpleNamespace(**entry) for entry in ls_result]
+
+    # Bind frequently used names locally so the loop doesn't need global / attribute lookups
+    FILE = schema.LsNodeType.FILE
+    # LsNodeType is a str enum which hashes like its values, so this also works with plain json string types
+    get_icon = {
+        schema.LsNodeType.DIR: FOLDER_ICON,
+        FILE: FILE_ICON,
+        schema.LsNodeType.SYMLINK: SYMLINK_ICON,
+        schema.LsNodeType.IRREGULAR: IRREGULAR_FILE_ICON,
+    }.get
+    tree_node = TreeNode
+    tree_dict = treedata.tree_dict
+    is_nt = os.name == "nt"
+    # Many files share the same size, so let's not humanize the same values over and over
+    human_sizes = {}
+
+    # Make sure we drop the prefix '/' so sg.TreeData does not get an empty root
+    paths = [entry.path.lstrip("/") for entry in ls_result]
+    if is_nt:
+        # On windows, we need to make sure tree keys don't get duplicate because of lower/uppercase
+        # Shown filenames aren't affected by this
+        keys = list(map(str.lower, paths))
+    else:
+        keys = paths
 
     # For performance reasons, we don't refactor this code in order to avoid allocating more variables
-    for entry in ls_result:
-        # Make sure we drop the prefix '/' so sg.TreeData does not get an empty root
-        if HAVE_MSGSPEC:
-            entry.path = entry.path.lstrip("/")
-            if os.name == "nt":
-                # On windows, we need to make sure tree keys don't get duplicate because of lower/uppercase
-                # Shown filenames aren't affected by this
-                entry.path = entry.path.lower()
-            parent = os.path.dirname(entry.path)
-
-            # Make sure we normalize mtime, and remove microseconds
-            # dateutil.parser.parse is *really* cpu hungry, let's replace it with a dumb alternative
-            # mtime = dateutil.parser.parse(entry["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
-            mtime = entry.mtime.strftime("%Y-%m-%d %H:%M:%S")
-            name = os.path.basename(entry.path)
-            if (
-                entry.type == schema.LsNodeType.DIR
-                and entry.path not in treedata.tree_dict
-            ):
-                treedata.Insert(
-                    parent=parent,
-                    key=entry.path,
-                    text=name,
-                    values=["", mtime],
-                    icon=FOLDER_ICON,
-                )
-            elif entry.type == schema.LsNodeType.FILE:
-                size = BytesConverter(entry.size).human
-                treedata.Insert(
-                    parent=parent,
-                    key=entry.path,
-                    text=name,
-                    values=[size, mtime],
-                    icon=FILE_ICON,
-                )
-            elif entry.type == schema.LsNodeType.SYMLINK:
-                treedata.Insert(
-                    parent=parent,
-                    key=entry.path,
-                    text=name,
-                    values=["", mtime],
-                    icon=SYMLINK_ICON,
-                )
-            elif entry.type == schema.LsNodeType.IRREGULAR:
-                treedata.Insert(
-                    parent=parent,
-                    key=entry.path,
-                    text=name,
-                    values=["", mtime],
-                    icon=IRREGULAR_FILE_ICON,
-                )
+    for entry, path, key in zip(ls_result, paths, keys):
+        # Paths are POSIX style, so a single rpartition gives us both parent and name
+        parent_path, _, name = path.rpartition("/")
+        parent = parent_path.lower() if is_nt else parent_path
+
+        entry_type = entry.type
+        icon = get_icon(entry_type)
+        if icon is None:
+            continue
+        # Make sure we normalize mtime, and remove microseconds
+        # dateutil.parser.parse is *really* cpu hungry, let's replace it with a dumb alternative
+        # mtime = dateutil.parser.parse(entry["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+        mtime = entry.mtime[0:19].replace("T", " ")
+        if entry_type == FILE:
+            size = human_sizes.get(entry.size)
+            if size is None:
+                size = human_sizes[entry.size] = BytesConverter(entry.size).human
+            values = [size, mtime]
         else:
-            entry["path"] = entry["path"].lstrip("/")
-            if os.name == "nt":
-                # On windows, we need to make sure tree keys don't get duplicate because of lower/uppercase
-                # Shown filenames aren't affected by this
-                entry["path"] = entry["path"].lower()
-            parent = os.path.dirname(entry["path"])
-
-            # Make sure we normalize mtime, and remove microseconds
-            # dateutil.parser.parse is *really* cpu hungry, let's replace it with a dumb alternative
-            # mtime = dateutil.parser.parse(entry["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
-            mtime = entry["mtime"][0:19]
-            name = os.path.basename(entry["name"])
-            if entry["type"] == "dir" and entry["path"] not in treedata.tree_dict:
-                treedata.Insert(
-                    parent=parent,
-                    key=entry["path"],
-                    text=name,
-                    values=["", mtime],
-                    icon=FOLDER_ICON,
-                )
-            elif entry["type"] == "file":
-                size = BytesConverter(entry["size"]).human
-                treedata.Insert(
-                    parent=parent,
-                    key=entry["path"],
-                    text=name,
-                    values=[size, mtime],
-                    icon=FILE_ICON,
-                )
-            elif entry["type"] == "symlink":
-                treedata.Insert(
-                    parent=parent,
-                    key=entry["path"],
-                    text=name,
-                    values=["", mtime],
-                    icon=SYMLINK_ICON,
-                )
-            elif entry["type"] == "irregular":
-                treedata.Insert(
-                    parent=parent,
-                    key=entry["path"],
-                    text=name,
-                    values=["", mtime],
-                    icon=IRREGULAR_FILE_ICON,
-                )
+            values = ["", mtime]
 
-        # Since the thread is heavily CPU bound, let's add a minimal
-        # arbitrary sleep time to let GUI update
-        # In a 130k entry scenario, using count % 1000 added less than a second on a 25 second run
-        count += 1
-        if not count % 2000:
-            sleep(0.0001)
-            logger.debug(f"Processed {count} entries")
+        # This is what sg.TreeData.Insert() does, without the extra function calls per entry and with lighter nodes
+        node = tree_node(parent, key, name, values, icon)
+        # setdefault only stores the node when the key is new, so duplicates are skipped with a single lookup
+        if tree_dict.setdefault(key, node) is not node:
+            continue
+        try:
+            tree_dict[parent].children.append(node)
+        except KeyError:
+            _add_missing_tree_parents(tree_dict, parent_path, is_nt)
+            tree_dict[parent].children.append(node)
+
+    # No need to sleep every now and then to let the GUI update, the interpreter already
+    # switches threads regularly while the main thread animates the loader
+    logger.debug(f"Processed {len(ls_result)} entries")
     return treedata
 
 
-def ls_window(repo_config: dict, snapshot_id: str) -> bool:
+def _get_snapshot_content(
+    repo_config: dict, snapshot_id: str
+) -> Tuple[Optional[str], Optional[sg.TreeData]]:
+    """
+    List snapshot content and build its tree
+    Returns snapshot description and tree data, or None, None on failure
+    """
     result = gui_thread_runner(
         repo_config,
         "ls",
@@ -343,7 +378,7 @@ def ls_window(repo_config: dict, snapshot_id: str) -> bool:
     # First entry of snapshot list is the snapshot description
     snapshot = result["output"].pop(0)
     try:
-        snap_date = dateutil.parser.parse(snapshot["time"])
+        snap_date = f"{snapshot['time'][0:10]} {snapshot['time'][11:19]}"
     except (KeyError, IndexError, TypeError):
         snap_date = "[inconnu]"
     try:
@@ -362,11 +397,10 @@ def ls_window(repo_config: dict, snapshot_id: str) -> bool:
     backup_id = f"{_t('main_gui.backup_content_from')} {snap_date} {_t('main_gui.run_as')} {username}@{hostname} {_t('main_gui.identified_by')} {short_id}"
     if not backup_id or not snapshot or not short_id:
         sg.PopupError(_t("main_gui.cannot_get_content"), keep_on_top=True)
-        return False
+        return None, None
 
     # The following thread is cpu intensive, so the GUI will update sluggerish
-    # In the thread, we added a sleep argument every 1000 iters so we get to update
-    # the GUI. Earlier fix was to preload animation
+    # Earlier fix was to preload animation
 
     # We get a thread result, hence pylint will complain the thread isn't a tuple
     # pylint: disable=E1101 (no-member)
@@ -380,15 +414,39 @@ def ls_window(repo_config: dict, snapshot_id: str) -> bool:
             background_color=BG_COLOR_LDR,
             text_color=TXT_COLOR_LDR,
         )
+        # Wait for the next animation frame instead of busy looping, so the tree builder thread gets the CPU
+        futures.wait([thread], timeout=0.05)
     sg.PopupAnimated(None)
 
     logger.info("Finished creating data tree")
+    return backup_id, thread.result()
+
+
+def ls_window(repo_config: dict, snapshot_id: str) -> bool:
+    # Snapshots are immutable, so we can show already built trees again
+    cache_key = (repo_config.g("repo_uri"), snapshot_id)
+    try:
+        backup_id, treedata = LS_WINDOW_CACHE[cache_key]
+        LS_WINDOW_CACHE.move_to_end(cache_key)
+        logger.info("Using already built data tree")
+    except KeyError:
+        backup_id, treedata = _get_snapshot_content(repo_config, snapshot_id)
+        if treedata is None:
+            return False
+        LS_WINDOW_CACHE[cache_key] = (backup_id, treedata)
+        if len(LS_WINDOW_CACHE) > LS_WINDOW_CACHE_SIZE:
+            LS_WINDOW_CACHE.popitem(last=False)
+
+    # Only hand top level nodes to the GUI tree, children are loaded when their parent gets expanded
+    shown_treedata = sg.TreeData()
+    for node in treedata.root_node.children:
+        shown_treedata.root_node.children.append(_shallow_tree_node(node))
 
     left_col = [
         [sg.Text(backup_id)],
         [
             sg.Tree(
-                data=thread.result(),
+                data=shown_treedata,
                 headings=[_t("generic.size"), _t("generic.modification_date")],
                 auto_size_columns=True,
                 select_mode=sg.TABLE_SELECT_MODE_EXTENDED,
@@ -415,23 +473,25 @@ def ls_window(repo_config: dict, snapshot_id: str) -> bool:
         grab_anywhere=True,
         keep_on_top=False,
         enable_close_attempted_event=True,
+        finalize=True,
     )
-
-    # Reclaim memory from thread result
-    # Note from v3 dev: This doesn't actually improve memory usage
-    del thread
-    del result
-    gc.collect()
+    window["-TREE-"].bind("<<TreeviewOpen>>", "+OPEN")
 
     while True:
         event, values = window.read()
         if event in (sg.WIN_CLOSED, sg.WIN_X_EVENT, "quit", "-WINDOW CLOSE ATTEMPED-"):
             break
+        if event == "-TREE-+OPEN":
+            _load_tree_node_children(window["-TREE-"], treedata)
         if event == "restore_to":
-            if not values["-TREE-"]:
+            # Placeholder rows of not yet expanded directories have tuple keys, they aren't restorable paths
+            restore_paths = [
+                key for key in values["-TREE-"] if not isinstance(key, tuple)
+            ]
+            if not restore_paths:
                 sg.PopupError(_t("main_gui.select_folder"), keep_on_top=True)
                 continue
-            restore_window(repo_config, snapshot_id, values["-TREE-"])
+            restore_window(repo_config, snapshot_id, restore_paths)
 
     # Closing a big sg.Tree is really slow
     # We can workaround this by emptying the Tree with a new sg.TreeData() object
@@ -532,25 +592,35 @@ def _main_gui(viewer_mode: bool):
     global backend_binary
     global GUI_STATUS_IGNORE_ERRORS
 
-    def check_for_auto_upgrade(config_file: str, full_config: dict) -> bool:
+    @threaded
+    def check_for_auto_upgrade(full_config: dict) -> None:
+        """
+        Query the upgrade server in background so GUI startup never waits for network I/O
+        Result is sent back to the event loop as --AUTO-UPGRADE-CHECKED-- event
+        """
         if full_config and full_config.g("global_options.auto_upgrade_server_url"):
-            upgrade_popup = popup_wait_for_upgrade(_t("main_gui.auto_upgrade_checking"))
-            auto_upgrade_result = upgrade_runner.check_new_version(full_config)
-            upgrade_popup.close()
-            if auto_upgrade_result:
-                r = sg.Popup(
-                    _t("config_gui.auto_upgrade_launch"),
-                    custom_text=(_t("generic.yes"), _t("generic.no")),
+            window.write_event_value(
+                "--AUTO-UPGRADE-CHECKED--",
+                upgrade_runner.check_new_version(full_config),
+            )
+
+    def propose_auto_upgrade(
+        config_file: str, full_config: dict, auto_upgrade_result: UpgradeCheck
+    ) -> None:
+        if auto_upgrade_result == UpgradeCheck.UPDATE:
+            r = sg.Popup(
+                _t("config_gui.auto_upgrade_launch"),
+                custom_text=(_t("generic.yes"), _t("generic.no")),
+            )
+            if r == _t("generic.yes"):
+                sg.Popup(
+                    _t("main_gui.upgrade_in_progress"),
                 )
-                if r == _t("generic.yes"):
-                    sg.Popup(
-                        _t("main_gui.upgrade_in_progress"),
-                    )
-                    result = upgrade_runner.run_upgrade(config_file, full_config)
-                    if not result:
-                        sg.Popup(_t("config_gui.auto_upgrade_failed"))
-            return auto_upgrade_result
-        return None
+                result = upgrade_runner.run_upgrade(
+                    config_file, full_config, known_new_version=auto_upgrade_result
+                )
+                if not result:
+                    sg.Popup(_t("config_gui.auto_upgrade_failed"))
 
     def select_config_file(config_file: str = None) -> None:
         """
@@ -597,11 +667,15 @@ def _main_gui(viewer_mode: bool):
         window.close()
         return config_file, action
 
+    # Snapshot list currently shown in the table
+    displayed_snapshot_list = None
+
     def gui_update_state() -> None:
         nonlocal current_state
         nonlocal backup_tz
         nonlocal repo_type
         nonlocal snapshot_list
+        nonlocal displayed_snapshot_list
 
         if current_state:
             window["--STATE-BUTTON--"].Update(
@@ -624,11 +698,27 @@ def _main_gui(viewer_mode: bool):
                 _t("generic.not_connected_yet"), button_color=GUI_STATE_UNKNOWN_BUTTON
             )
         window["-repo_type-"].Update(repo_type)
-        window["snapshot-list"].Update(snapshot_list)
+        # Updating the table replaces every row, skip it when snapshots did not change
+        if snapshot_list != displayed_snapshot_list:
+            window["snapshot-list"].Update(snapshot_list)
+            displayed_snapshot_list = snapshot_list
+
+    # Recent snapshot list results as {repo_uri: (monotonic time, (current_state, backup_tz, snapshot_list))}
+    gui_data_cache = {}
 
     def get_gui_data(repo_config: dict) -> Tuple[bool, List[str]]:
         global GUI_STATUS_IGNORE_ERRORS
 
+        # Avoid querying the repo again on repeated refreshes
+        cache_key = repo_config.g("repo_uri") if repo_config else None
+        try:
+            data_time, gui_data = gui_data_cache[cache_key]
+            if time.monotonic() - data_time < GUI_DATA_CACHE_TTL:
+                logger.debug("Using recent snapshot list")
+                return gui_data
+        except KeyError:
+            pass
+
         window["--STATE-BUTTON--"].Update(
             _t("generic.please_wait"), button_color="orange"
         )
@@ -666,13 +756,18 @@ def _main_gui(viewer_mode: bool):
                 # So we get different snapshot time formats depending on platforms:
                 # windows   2024-09-06T13:58:10.7684887+02:00
                 # Linux     2024-09-06T11:39:06.566382538Z
-                if re.match(
-                    r"[0-9]{4}-[0-1][0-9]-[0-3][0-9]T[0-2][0-9]:[0-5][0-9]:[0-5][0-9]\..*(Z|[+-][0-2][0-9]:[0-9]{2})?",
-                    snapshot["time"],
+                # Checking the date and time separators is enough, no need for a regex
+                snapshot_time = snapshot["time"]
+                if (
+                    len(snapshot_time) >= 19
+                    and snapshot_time[4] == "-"
+                    and snapshot_time[7] == "-"
+                    and snapshot_time[10] == "T"
+                    and snapshot_time[13] == ":"
+                    and snapshot_time[16] == ":"
                 ):
-                    snapshot_date = dateutil.parser.parse(snapshot["time"]).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    )
+                    # No need for dateutil parsing, we only keep local date and time without microseconds
+                    snapshot_date = f"{snapshot_time[0:10]} {snapshot_time[11:19]}"
                 else:
                     snapshot_date = "Unparseable"
                 snapshot_username = snapshot["username"]
@@ -694,7 +789,11 @@ def _main_gui(viewer_mode: bool):
                         snapshot_tags,
                     ]
                 )
-        return current_state, backup_tz, snapshot_list
+        gui_data = current_state, backup_tz, snapshot_list
+        # Don't keep failed results, so next refresh tries again
+        if current_state is not None:
+            gui_data_cache[cache_key] = (time.monotonic(), gui_data)
+        return gui_data
 
     def get_config_file(config_file: str = None) -> str:
         """
@@ -725,6 +824,8 @@ def _main_gui(viewer_mode: bool):
                 if action == "--CANCEL--":
                     break
                 if action == "--NEW-CONFIG--":
+                    from npbackup.gui.config import config_gui
+
                     full_config = config_gui(
                         npbackup.configuration.get_default_config(), config_file
                     )
@@ -751,6 +852,7 @@ def _main_gui(viewer_mode: bool):
         config_file: str = None, window: sg.Window = None, repo_name: str = "default"
     ) -> Tuple:
         full_config, config_file = get_config_file(config_file=config_file)
+        repo_list = npbackup.configuration.get_repo_list(full_config)
         if full_config and config_file:
             repo_config, _ = npbackup.configuration.get_repo_config(
                 full_config, repo_name=repo_name
@@ -762,17 +864,15 @@ def _main_gui(viewer_mode: bool):
             backup_destination = "None"
             repo_type = "None"
             repo_uri = "None"
-        repo_list = npbackup.configuration.get_repo_list(full_config)
 
         if window:
             if config_file:
                 window.set_title(f"{SHORT_PRODUCT_NAME} - {config_file}")
             if not viewer_mode and full_config:
-                window["--LAUNCH-BACKUP--"].Update(disabled=False)
-                window["--SEE-CONTENT--"].Update(disabled=False)
-                window["--OPERATIONS--"].Update(disabled=False)
-                window["--FORGET--"].Update(disabled=False)
-                window["--CONFIGURE--"].Update(disabled=False)
+                for key in ACTION_BUTTONS:
+                    button = window[key]
+                    if button.Disabled:
+                        button.Update(disabled=False)
             if repo_list:
                 window["-active_repo-"].Update(values=repo_list, value=repo_list[0])
         return (
@@ -884,7 +984,9 @@ def _main_gui(viewer_mode: bool):
             repo_list,
         ) = get_config(config_file=config_file, repo_name=args.repo_name)
 
-    right_click_menu = ["", [_t("generic.destination")]]
+    # Right click menu events are their translated text, so we only translate it once
+    destination_event = _t("generic.destination")
+    right_click_menu = ["", [destination_event]]
     headings = [
         "ID    ",
         "Date      ",
@@ -1025,10 +1127,7 @@ def _main_gui(viewer_mode: bool):
         ]
     ]
 
-    if not viewer_mode and (version_dict["comp"] or _NPBACKUP_ALLOW_AUTOUPGRADE_DEBUG):
-        auto_upgrade_result = check_for_auto_upgrade(config_file, full_config)
-    else:
-        auto_upgrade_result = None
+    auto_upgrade_result = UpgradeCheck.UNKNOWN
     window = sg.Window(
         f"{SHORT_PRODUCT_NAME} - {config_file}",
         layout,
@@ -1048,7 +1147,8 @@ def _main_gui(viewer_mode: bool):
     # Auto reisze table to window size
     window["snapshot-list"].expand(True, True)
 
-    window.read(timeout=0.01)
+    if not viewer_mode and (version_dict["comp"] or _NPBACKUP_ALLOW_AUTOUPGRADE_DEBUG):
+        check_for_auto_upgrade(full_config)
     if not config_file and not full_config and not viewer_mode:
         window["-NO-CONFIG-"].Update(visible=True)
 
@@ -1061,28 +1161,36 @@ def _main_gui(viewer_mode: bool):
             snapshot_list = []
         gui_update_state()
 
+    # Known repo names, so unknown repos can be refused without walking the config
+    repo_names = frozenset(repo_list)
+
     while True:
-        event, values = window.read(timeout=60000)
+        event, values = window.read()
 
         if event in (sg.WIN_X_EVENT, sg.WIN_CLOSED, "--EXIT--"):
             break
+        if event == "--AUTO-UPGRADE-CHECKED--":
+            auto_upgrade_result = values[event]
+            propose_auto_upgrade(config_file, full_config, auto_upgrade_result)
         if event == "-active_repo-":
             active_repo = values["-active_repo-"]
-            if full_config.g(f"repos.{active_repo}"):
-                (
-                    repo_config,
-                    _,
-                ) = npbackup.configuration.get_repo_config(full_config, active_repo)
-                current_state, backup_tz, snapshot_list = get_gui_data(repo_config)
-                gui_update_state()
-            else:
+            active_repo_config = None
+            if active_repo in repo_names:
+                active_repo_config, _ = npbackup.configuration.get_repo_config(
+                    full_config, active_repo
+                )
+            if not active_repo_config:
                 sg.PopupError("Repo not existent in config", keep_on_top=True)
                 continue
+            repo_config = active_repo_config
+            current_state, backup_tz, snapshot_list = get_gui_data(repo_config)
+            gui_update_state()
         if event == "--LAUNCH-BACKUP--":
             if not full_config:
                 sg.PopupError(_t("main_gui.no_config"), keep_on_top=True)
                 continue
             backup(repo_config)
+            gui_data_cache.clear()
             event = "--STATE-BUTTON--"
         if event == "--SEE-CONTENT--":
             if not repo_config:
@@ -1096,7 +1204,6 @@ def _main_gui(viewer_mode: bool):
                 continue
             snapshot_to_see = snapshot_list[values["snapshot-list"][0]][0]
             ls_window(repo_config, snapshot_to_see)
-            gc.collect()
         if event == "--FORGET--":
             if not full_config:
                 sg.PopupError(_t("main_gui.no_config"), keep_on_top=True)
@@ -1104,23 +1211,30 @@ def _main_gui(viewer_mode: bool):
             if not values["snapshot-list"]:
                 sg.Popup(_t("main_gui.select_backup"), keep_on_top=True)
                 continue
-            snapshots_to_forget = []
-            for row in values["snapshot-list"]:
-                snapshots_to_forget.append(snapshot_list[row][0])
+            snapshots_to_forget = [
+                snapshot_list[row][0] for row in values["snapshot-list"]
+            ]
             forget_snapshot(repo_config, snapshots_to_forget)
+            gui_data_cache.clear()
             # Make sure we trigger a GUI refresh after forgetting snapshots
             event = "--STATE-BUTTON--"
         if event == "--OPERATIONS--":
             if not full_config:
                 sg.PopupError(_t("main_gui.no_config"), keep_on_top=True)
                 continue
+            from npbackup.gui.operations import operations_gui
+
             full_config = operations_gui(full_config)
+            gui_data_cache.clear()
             event = "--STATE-BUTTON--"
         if event == "--CONFIGURE--":
             if not full_config:
                 sg.PopupError(_t("main_gui.no_config"), keep_on_top=True)
                 continue
+            from npbackup.gui.config import config_gui
+
             full_config = config_gui(full_config, config_file)
+            gui_data_cache.clear()
             GUI_STATUS_IGNORE_ERRORS = True
             # Make sure we trigger a GUI refresh when configuration is changed
             # Also make sure we retrigger get_config
@@ -1158,6 +1272,7 @@ def _main_gui(viewer_mode: bool):
                 repo_type = _repo_type
                 _ = _repo_uri
                 repo_list = _repo_list
+                repo_names = frozenset(repo_list)
             else:
                 sg.PopupError(
                     _t("main_gui.cannot_load_config_keep_current"), keep_on_top=True
@@ -1167,13 +1282,12 @@ def _main_gui(viewer_mode: bool):
             elif not viewer_mode:
                 window["-NO-CONFIG-"].Update(visible=False)
             event = "--STATE-BUTTON--"
-        if event == _t("generic.destination"):
+        if event == destination_event:
             try:
                 if repo_type:
+                    destination_string = repo_config.g("repo_uri")
                     if repo_type in ["REST", "SFTP"]:
-                        destination_string = repo_config.g("repo_uri").split("@")[-1]
-                    else:
-                        destination_string = repo_config.g("repo_uri")
+                        destination_string = destination_string.split("@")[-1]
                     sg.PopupNoFrame(destination_string)
                 else:
                     sg.PopupNoFrame(_t("main_gui.unknown_repo"))
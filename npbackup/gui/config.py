@@ -2219,6 +2219,10 @@ Google Cloud storage: GOOGLE_PROJECT_ID  GOOGLE_APPLICATION_CREDENTIALS\n\
     if config_file:
         window.set_title(f"Configuration - {config_file}")
 
+    # NPF-SEC-00009
+    # Read once per window, changing the variable while the window is open has no effect
+    env_manager_password = os.environ.get("NPBACKUP_MANAGER_PASSWORD", None)
+
     while True:
         event, values = window.read()
         # Get object type for various delete operations
@@ -2315,7 +2319,7 @@ Google Cloud storage: GOOGLE_PROJECT_ID  GOOGLE_APPLICATION_CREDENTIALS\n\
                 key = "backup_opts.paths"
                 tree = backup_paths_tree
                 node = sg.PopupGetText(_t("generic.add_manually"))
-                if node and os.path.exists(node) and os.path.isdir(node):
+                if node and os.path.isdir(node):
                     icon = FOLDER_ICON
                 else:
                     icon = FILE_ICON
@@ -2494,8 +2498,6 @@ Google Cloud storage: GOOGLE_PROJECT_ID  GOOGLE_APPLICATION_CREDENTIALS\n\
             manager_password = configuration.get_manager_password(
                 full_config, object_name
             )
-            # NPF-SEC-00009
-            env_manager_password = os.environ.get("NPBACKUP_MANAGER_PASSWORD", None)
             if not manager_password:
                 sg.PopupError(
                     _t("config_gui.no_manager_password_defined"), keep_on_top=True
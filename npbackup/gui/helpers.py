@@ -12,6 +12,7 @@ __build__ = "2025013001"
 
 from typing import Tuple, Union
 from logging import getLogger
+from functools import lru_cache
 from time import sleep
 import re
 import queue
@@ -44,6 +45,7 @@ else:
     logger.info("Running without threads as per debug requirements")
 
 
+@lru_cache(maxsize=32)
 def get_anon_repo_uri(repository: str) -> Tuple[str, str]:
     """
     Remove user / password part from repository uri
@@ -446,6 +446,10 @@ def operations_gui(full_config: dict) -> dict:
     # Auto reisze table to window size
     window["repo-and-group-list"].expand(True, True)
 
+    # NPF-SEC-00009
+    # Read once per window, changing the variable while the window is open has no effect
+    env_manager_password = os.environ.get("NPBACKUP_MANAGER_PASSWORD", None)
+
     while True:
         event, values = window.read()
 
@@ -462,8 +466,6 @@ def operations_gui(full_config: dict) -> dict:
                 sg.PopupError(_t("operations_gui.no_repo_selected"), keep_on_top=True)
                 continue
             manager_password = get_manager_password(full_config, object_name)
-            # NPF-SEC-00009
-            env_manager_password = os.environ.get("NPBACKUP_MANAGER_PASSWORD", None)
             if not manager_password:
                 sg.PopupError(
                     _t("config_gui.no_manager_password_defined"), keep_on_top=True
@@ -17,7 +17,6 @@ import sys
 from logging import getLogger
 import re
 from datetime import datetime, timezone
-import dateutil.parser
 import queue
 from functools import wraps
 from command_runner import command_runner
@@ -36,6 +35,9 @@ try:
     import msgspec
 
     HAVE_MSGSPEC = True
+    # Decoders are reusable, no need to create them for every output conversion
+    JSON_DECODER = msgspec.json.Decoder()
+    LS_NODE_DECODER = msgspec.json.Decoder(schema.LsNode)
 except ImportError:
     # We may not have msgspec on Python 3.7
     import json
@@ -45,6 +47,22 @@ except ImportError:
 logger = getLogger()
 
 
+def iter_lines(output: str):
+    """
+    Lazy equivalent of output.split("\\n")
+    Restic ls may return millions of lines, so we don't want to hold a second copy of the output while decoding it
+    """
+    start = 0
+    find = output.find
+    while True:
+        end = find("\n", start)
+        if end == -1:
+            yield output[start:]
+            return
+        yield output[start:end]
+        start = end + 1
+
+
 class ResticRunner:
     def __init__(
         self,
@@ -722,13 +740,13 @@ class ResticRunner:
             if result:
                 if output:
                     if HAVE_MSGSPEC:
-                        decoder = msgspec.json.Decoder()
-                        ls_decoder = msgspec.json.Decoder(schema.LsNode)
+                        decoder = JSON_DECODER
+                        ls_decoder = LS_NODE_DECODER
                     is_first_line = True
                     # Make sure we always deal with str output (--has-recent-snapshot returns a datetime object)
                     if not isinstance(output, str):
                         output = str(output)
-                    for line in output.split("\n"):
+                    for line in iter_lines(output):
                         if not line:
                             continue
                         if HAVE_MSGSPEC:
@@ -933,8 +951,9 @@ class ResticRunner:
                     self.write_logs("Bogus source type given", level="error")
                     return False, ""
 
-                for path in paths:
-                    cmd += ' {} "{}"'.format(source_parameter, path)
+                cmd += "".join(
+                    ' {} "{}"'.format(source_parameter, path) for path in paths
+                )
             else:
                 # make sure path is a list and does not have trailing slashes, unless we're backing up root
                 # We don't need to scan files for ETA, so let's add --no-scan
@@ -1331,6 +1350,9 @@ class ResticRunner:
             r"[0-9]{4}-[0-1][0-9]-[0-3][0-9]T[0-2][0-9]:[0-5][0-9]:[0-5][0-9](\.\d*)?(\+[0-2][0-9]:[0-9]{2})?",
             last_snapshot["time"],
         ):
+            # dateutil is slow to import and only needed here, so don't load it at startup
+            import dateutil.parser
+
             backup_ts = dateutil.parser.parse(last_snapshot["time"])
             snapshot_age_minutes = (tz_aware_timestamp - backup_ts).total_seconds() / 60
             if delta - snapshot_age_minutes > 0:
@@ -11,7 +11,6 @@ __description__ = "Restic json output schemas"
 
 
 from typing import Optional
-from datetime import datetime
 from enum import Enum
 
 try:
@@ -37,15 +36,17 @@ class LsNodeType(str, Enum):
     IRREGULAR = "irregular"
 
 
-class LsNode(Struct, omit_defaults=True):
+class LsNode(Struct, omit_defaults=True, gc=False):
     """
     restic ls outputs lines of
     {"name": "b458b848.2024-04-28-13h07.gz", "type": "file", "path": "/path/b458b848.2024-04-28-13h07.gz", "uid": 0, "gid": 0, "size": 82638431, "mode": 438, "permissions": "-rw-rw-rw-", "mtime": "2024-04-29T10:32:18+02:00", "atime": "2024-04-29T10:32:18+02:00", "ctime": "2024-04-29T10:32:18+02:00", "message_type": "node", "struct_type": "node"}
     # In order to save some memory in GUI, let's drop unused data
+    # LsNode only holds scalar values, so we can skip garbage collector tracking for the (many) instances
     """
 
     # name: str  # We don't need name, we have path from which we extract name, which is more memory efficient
     type: LsNodeType
     path: str
-    mtime: datetime
+    # Keep mtime as ISO 8601 string, we only need to slice it for display, which is way cheaper than datetime decoding
+    mtime: str
     size: Optional[int] = None
@@ -64,6 +64,50 @@ def _get_target_id(auto_upgrade_host_identity: str, group: str) -> str:
     return target
 
 
+# Authenticated upgrade server sessions, so subsequent requests can reuse connections
+REQUESTORS = {}
+
+
+def _close_requestors() -> None:
+    for requestor in REQUESTORS.values():
+        if requestor.api_session:
+            requestor.api_session.close()
+    REQUESTORS.clear()
+
+
+atexit.register(_close_requestors)
+
+
+def _get_requestor(
+    upgrade_url: str, username: str, password: str, ignore_errors: bool = False
+) -> Requestor:
+    """
+    Get an upgrade server requestor, reusing an already established session when possible
+    """
+    key = (upgrade_url, username, password)
+    requestor = REQUESTORS.get(key)
+    if requestor is None:
+        requestor = Requestor(upgrade_url, username, password)
+        requestor.app_name = "npbackup" + version_dict["version"]
+        requestor.user_agent = __intname__
+        requestor.ignore_errors = ignore_errors
+        # Only keep sessions that could be established
+        # create_session() also returns True for a single unreachable server, so check the session itself
+        if requestor.create_session(authenticated=True) and requestor.api_session:
+            REQUESTORS[key] = requestor
+    requestor.ignore_errors = ignore_errors
+    return requestor
+
+
+def _drop_requestor(upgrade_url: str, username: str, password: str) -> None:
+    """
+    Forget a cached requestor after a failed request, so next call creates a new session
+    """
+    requestor = REQUESTORS.pop((upgrade_url, username, password), None)
+    if requestor is not None and requestor.api_session:
+        requestor.api_session.close()
+
+
 def _check_new_version(
     upgrade_url: str,
     username: str,
@@ -84,19 +128,17 @@ def _check_new_version(
         logger.debug("Upgrade server not set")
         return None
     try:
-        requestor = Requestor(upgrade_url, username, password)
-        requestor.app_name = "npbackup" + version_dict["version"]
-        requestor.user_agent = __intname__
-        requestor.ignore_errors = ignore_errors
-        requestor.create_session(authenticated=True)
+        requestor = _get_requestor(upgrade_url, username, password, ignore_errors)
         server_ident = requestor.data_model()
         if server_ident is False:
+            _drop_requestor(upgrade_url, username, password)
             if ignore_errors:
                 logger.info("Cannot reach upgrade server")
             else:
                 logger.error("Cannot reach upgrade server")
             return None
     except Exception as exc:
+        _drop_requestor(upgrade_url, username, password)
         logger.error(f"Upgrade server response '{server_ident}' is bogus: {exc}")
         logger.debug("Trace", exc_info=True)
         return None
@@ -123,6 +165,7 @@ def _check_new_version(
     result = requestor.data_model("current_version", id_record=target_id)
     logger.info(f"Upgrade server response to current version: {result}")
     if result is False:
+        _drop_requestor(upgrade_url, username, password)
         msg = "Upgrade server didn't respond properly. Is it well configured ?"
         if ignore_errors:
             logger.info(msg)
@@ -171,12 +214,15 @@ def auto_upgrader(
     auto_upgrade_host_identity: str = None,
     group: str = None,
     ignore_errors: bool = False,
+    skip_version_check: bool = False,
 ) -> bool:
     """
     Auto upgrade binary NPBackup distributions
 
     We must check that we run a compiled binary first
     We assume that we run a onefile nuitka binary
+
+    skip_version_check can be used when caller already knows a newer version exists
     """
     if not IS_COMPILED:
         logger.info(
@@ -188,24 +234,25 @@ def auto_upgrader(
             "Debug mode allows auto upgrade on non-compiled versions. Be aware that this will probably mess up your installation"
         )
 
-    res = _check_new_version(
-        upgrade_url,
-        username,
-        password,
-        ignore_errors=ignore_errors,
-        auto_upgrade_host_identity=auto_upgrade_host_identity,
-        group=group,
-    )
+    if skip_version_check:
+        logger.info("Newer version already known, skipping version check")
+        res = True
+    else:
+        res = _check_new_version(
+            upgrade_url,
+            username,
+            password,
+            ignore_errors=ignore_errors,
+            auto_upgrade_host_identity=auto_upgrade_host_identity,
+            group=group,
+        )
     # Let's set a global environment variable which we can check later in metrics
     os.environ["NPBACKUP_UPGRADE_STATE"] = "0"
     if not res:
         if res is None:
             os.environ["NPBACKUP_UPGRADE_STATE"] = "1"
         return False
-    requestor = Requestor(upgrade_url, username, password)
-    requestor.app_name = "npbackup" + version_dict["version"]
-    requestor.user_agent = __intname__
-    requestor.create_session(authenticated=True)
+    requestor = _get_requestor(upgrade_url, username, password)
 
     # This allows to get the current running target identification for upgrade server to return the right file
     target_id = _get_target_id(
@@ -225,6 +272,7 @@ def auto_upgrader(
                     "No upgrade script found. We'll try to use the inline script"
                 )
             else:
+                _drop_requestor(upgrade_url, username, password)
                 logger.error(f"Cannot get file description for {file_type}")
                 return False
         try:
@@ -253,6 +301,7 @@ def auto_upgrader(
         )
         if not file_data[file_type]:
             if file_type != "script":
+                _drop_requestor(upgrade_url, username, password)
                 logger.error("Cannot get update file")
                 return False
         else:
@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+#  -*- coding: utf-8 -*-
+
+
+__intname__ = "npbackup_configuration_tests"
+__author__ = "Orsiris de Jong"
+__copyright__ = "Copyright (C) 2025 NetInvent"
+__license__ = "BSD-3-Clause"
+__build__ = "2025013001"
+
+
+"""
+Configuration loading tests
+load_config reuses already loaded configurations as long as the file doesn't change
+"""
+
+import sys
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from npbackup import configuration
+
+
+ORIGINAL_CONF_FILE_PATH = Path(__file__).absolute().parent.joinpath(
+    "npbackup-cli-test-linux.yaml"
+)
+
+
+class LoadCounter:
+    """
+    Counts actual configuration file loads, bypassing the cache
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._load_config = configuration._load_config
+
+    def __call__(self, config_file):
+        self.count += 1
+        return self._load_config(config_file)
+
+    def __enter__(self):
+        configuration._load_config = self
+        return self
+
+    def __exit__(self, *args):
+        configuration._load_config = self._load_config
+
+
+def _get_conf_file() -> Path:
+    conf_dir = tempfile.mkdtemp(prefix="npbackup_config_tests")
+    conf_file = Path(conf_dir).joinpath("npbackup.conf")
+    shutil.copyfile(ORIGINAL_CONF_FILE_PATH, conf_file)
+    configuration.LOADED_CONFIGS.clear()
+    return conf_file
+
+
+def test_load_config_returns_copies():
+    conf_file = _get_conf_file()
+    try:
+        with LoadCounter() as load_counter:
+            full_config = configuration.load_config(conf_file)
+            assert full_config
+            same_config = configuration.load_config(conf_file)
+            assert load_counter.count == 1
+        assert same_config == full_config
+        assert same_config is not full_config
+
+        # Modifying a loaded configuration must not alter later loads
+        repo_uri = full_config.g("repos.default.repo_uri")
+        full_config.s("repos.default.repo_uri", "/some/other/repo")
+        full_config.s("repos.default.repo_opts.repo_password", "modified")
+        new_config = configuration.load_config(conf_file)
+        assert new_config.g("repos.default.repo_uri") == repo_uri
+        assert new_config.g("repos.default.repo_opts.repo_password") != "modified"
+    finally:
+        shutil.rmtree(conf_file.parent)
+
+
+def test_load_config_invalidated_on_mtime_change():
+    conf_file = _get_conf_file()
+    try:
+        with LoadCounter() as load_counter:
+            assert configuration.load_config(conf_file)
+            stat = os.stat(conf_file)
+            os.utime(conf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            assert configuration.load_config(conf_file)
+            assert load_counter.count == 2
+            # Unchanged file is loaded from cache again
+            assert configuration.load_config(conf_file)
+            assert load_counter.count == 2
+    finally:
+        shutil.rmtree(conf_file.parent)
+
+
+def test_load_config_invalidated_on_size_change():
+    conf_file = _get_conf_file()
+    try:
+        with LoadCounter() as load_counter:
+            assert configuration.load_config(conf_file)
+            stat = os.stat(conf_file)
+            with open(conf_file, "a", encoding="utf-8") as fp:
+                fp.write("\n# Some comment that changes file size\n")
+            # Keep mtime identical, so only the size tells the file changed
+            os.utime(conf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            assert configuration.load_config(conf_file)
+            assert load_counter.count == 2
+    finally:
+        shutil.rmtree(conf_file.parent)
+
+
+if __name__ == "__main__":
+    test_load_config_returns_copies()
+    test_load_config_invalidated_on_mtime_change()
+    test_load_config_invalidated_on_size_change()
@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+#  -*- coding: utf-8 -*-
+
+
+__intname__ = "npbackup_runner_tests"
+__author__ = "Orsiris de Jong"
+__copyright__ = "Copyright (C) 2025 NetInvent"
+__license__ = "BSD-3-Clause"
+__build__ = "2025013001"
+
+
+"""
+Runner helper tests
+split_command decides which password commands can run without a shell
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from npbackup.core.runner import split_command
+
+
+def test_split_command_without_shell():
+    if os.name == "nt":
+        # Windows commands always go through cmd
+        assert split_command("type password.txt") is None
+        assert split_command("echo secret") is None
+        return
+    assert split_command("echo secret") == ["echo", "secret"]
+    assert split_command("cat /etc/npbackup/password") == [
+        "cat",
+        "/etc/npbackup/password",
+    ]
+    assert split_command('pass show "my repo"') == ["pass", "show", "my repo"]
+    # Assignments which aren't leading variable assignments are just arguments
+    assert split_command("vault read -field=password secret/npbackup") == [
+        "vault",
+        "read",
+        "-field=password",
+        "secret/npbackup",
+    ]
+
+
+def test_split_command_needs_shell():
+    for command in (
+        "echo secret # comment",
+        "VAR=x cmd",
+        " VAR=x cmd",
+        "[ -f /etc/password ] && cat /etc/password",
+        "cat /etc/password | head -n 1",
+        "cat password.txt; echo",
+        "echo $HOME",
+        "echo `whoami`",
+        "cat ~/password",
+        "cat *.txt",
+        "cat < password.txt",
+        "echo 'unbalanced",
+        "echo a\necho b",
+    ):
+        assert split_command(command) is None, f"{command} should need a shell"
+
+
+if __name__ == "__main__":
+    test_split_command_without_shell()
+    test_split_command_needs_shell()
@@ -0,0 +1,85 @@
+#! /usr/bin/env python3
+#  -*- coding: utf-8 -*-
+
+
+__intname__ = "npbackup_upgrade_runner_tests"
+__author__ = "Orsiris de Jong"
+__copyright__ = "Copyright (C) 2025 NetInvent"
+__license__ = "BSD-3-Clause"
+__build__ = "2025013001"
+
+
+"""
+Upgrade counter tests, making sure counters written by older versions are still understood
+"""
+
+import sys
+import os
+import struct
+import tempfile
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from npbackup.core import upgrade_runner
+
+
+def _run_need_upgrade(content: bytes, upgrade_interval: int):
+    """
+    Run need_upgrade against a counter file with given content
+    Returns need_upgrade result and counter file content afterwards
+    """
+    fd, counter_file = tempfile.mkstemp(prefix="npbackup.autoupgrade.")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(content)
+        upgrade_runner.COUNTER_FILE_PATH = counter_file
+        result = upgrade_runner.need_upgrade(upgrade_interval)
+        with open(counter_file, "rb") as fp:
+            new_content = fp.read()
+    finally:
+        upgrade_runner.COUNTER_FILE_PATH = None
+        os.remove(counter_file)
+    return result, new_content
+
+
+def test_decode_counter():
+    assert upgrade_runner._decode_counter(b"") == 1
+    # Plain text counters from older versions, including 4 digit ones which have the same length as binary counters
+    assert upgrade_runner._decode_counter(b"7") == 7
+    assert upgrade_runner._decode_counter(b"1234") == 1234
+    assert upgrade_runner._decode_counter(b"12345") == 12345
+    # Binary counters
+    assert upgrade_runner._decode_counter(struct.pack("<I", 5)) == 5
+    assert upgrade_runner._decode_counter(struct.pack("<I", 1234)) == 1234
+    try:
+        upgrade_runner._decode_counter(b"bogus")
+    except ValueError:
+        pass
+    else:
+        assert False, "Bogus counter content should not be decoded"
+
+
+def test_need_upgrade_text_counter():
+    result, content = _run_need_upgrade(b"1234", 2000)
+    assert result is False
+    assert content == struct.pack("<I", 1235)
+
+    result, content = _run_need_upgrade(b"10", 10)
+    assert result is True
+    assert content == struct.pack("<I", 1)
+
+
+def test_need_upgrade_binary_counter():
+    result, content = _run_need_upgrade(struct.pack("<I", 3), 10)
+    assert result is False
+    assert content == struct.pack("<I", 4)
+
+    result, content = _run_need_upgrade(struct.pack("<I", 10), 10)
+    assert result is True
+    assert content == struct.pack("<I", 1)
+
+
+if __name__ == "__main__":
+    test_decode_counter()
+    test_need_upgrade_text_counter()
+    test_need_upgrade_binary_counter()